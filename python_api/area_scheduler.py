@@ -0,0 +1,78 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from places_cache import CACHE_DIR
+
+
+class AreaScheduler:
+    """Thompson-sampling choice of which area to search next.
+
+    Each area (per keyword) keeps how many places its searches returned, including ones
+    skipped as already known, and how many of them were new businesses without a
+    website. pick() draws a hit rate for every candidate from Beta(1 + found,
+    1 + scanned - found) and returns the highest draw, so high-yield areas are searched
+    most while rarely-tried ones still get a turn.
+    """
+
+    def __init__(self, path=None, rng=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "area_yield.sqlite3")
+        self.path = path
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS area_yield (
+                area TEXT PRIMARY KEY,
+                visits INTEGER NOT NULL,
+                scanned INTEGER NOT NULL,
+                found INTEGER NOT NULL,
+                visited_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def _stats(self, area_keys):
+        placeholders = ",".join("?" * len(area_keys))
+        rows = self._conn.execute(
+            f"SELECT area, scanned, found FROM area_yield WHERE area IN ({placeholders})", area_keys
+        ).fetchall()
+        return {area: (scanned, found) for area, scanned, found in rows}
+
+    def pick(self, area_keys):
+        """Return the area key with the best sampled hit rate, or None if area_keys is empty."""
+        area_keys = list(area_keys)
+        if not area_keys:
+            return None
+        with self._lock:
+            stats = self._stats(area_keys)
+            samples = {}
+            for area in area_keys:
+                scanned, found = stats.get(area, (0, 0))
+                samples[area] = self._rng.betavariate(1 + found, 1 + max(0, scanned - found))
+        return max(area_keys, key=samples.get)
+
+    def record(self, area_key, scanned, found):
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO area_yield (area, visits, scanned, found, visited_at) VALUES (?, 1, ?, ?, ?)
+                   ON CONFLICT(area) DO UPDATE SET
+                       visits = visits + 1,
+                       scanned = scanned + excluded.scanned,
+                       found = found + excluded.found,
+                       visited_at = excluded.visited_at""",
+                (area_key, scanned, found, time.time())
+            )
+            self._conn.commit()
+
+    def yield_rate(self, area_key):
+        with self._lock:
+            scanned, found = self._stats([area_key]).get(area_key, (0, 0))
+        return found / scanned if scanned else None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
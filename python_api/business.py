@@ -0,0 +1,125 @@
+import ast
+import json
+import os
+from dataclasses import dataclass, field, fields
+
+
+def parse_list_field(value, separator=","):
+    """Raw fields may hold a list, its repr, or a separated string."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str) and value.startswith("[") and value.endswith("]"):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return [v.strip() for v in value.strip("[]").split(",") if v.strip()]
+    if isinstance(value, str) and separator != "," and separator in value:
+        return value.split(separator)
+    return [v.strip() for v in str(value or "").split(",") if v.strip()]
+
+
+@dataclass(slots=True)
+class Business:
+    """One place, normalized once where it leaves GoogleMapsClient.
+
+    Attributes keep their Places API names so to_dict() writes the same data.json as
+    before; list-like fields are always parsed lists. Raw fields with no attribute
+    (icon, utc_offset, service flags, owner contact...) live in `extra`. get() and
+    item access mirror a dict for code written against raw Places responses.
+    """
+
+    place_id: str = None
+    name: str = None
+    vicinity: str = None
+    formatted_address: str = None
+    formatted_phone_number: str = None
+    international_phone_number: str = None
+    rating: float = None
+    user_ratings_total: int = None
+    price_level: int = None
+    business_status: str = None
+    website: str = None
+    url: str = None
+    types: list = field(default_factory=list)
+    opening_hours: dict = None
+    reviews: list = field(default_factory=list)
+    photos: list = field(default_factory=list)
+    photo_urls: list = field(default_factory=list)
+    slug: str = None
+    local_photos: list = None
+    extra: dict = field(default_factory=dict)
+    # Fields the source dict had; to_dict() writes them back even when empty or null
+    present: set = field(default_factory=set, repr=False, compare=False)
+
+    @classmethod
+    def from_places(cls, data):
+        """Build from a Places details dict or a loaded data.json; Business instances pass through."""
+        if isinstance(data, cls):
+            return data
+        data = dict(data)
+        business = cls()
+        for name in _FIELD_NAMES:
+            if name in data:
+                setattr(business, name, data.pop(name))
+                business.present.add(name)
+        business.extra = data
+
+        business.types = parse_list_field(business.types or "")
+        business.reviews = [r for r in parse_list_field(business.reviews) if isinstance(r, dict)] if business.reviews else []
+        business.photos = [p for p in parse_list_field(business.photos) if isinstance(p, dict)] if business.photos else []
+        business.photo_urls = parse_list_field(business.photo_urls or "", separator="|||")
+        if business.opening_hours is not None and not isinstance(business.opening_hours, dict):
+            business.opening_hours = {"weekday_text": [str(business.opening_hours)]}
+        return business
+
+    @classmethod
+    def load(cls, folder_path):
+        with open(os.path.join(folder_path, "data.json"), "r", encoding="utf-8") as f:
+            return cls.from_places(json.load(f))
+
+    def to_dict(self):
+        data = dict(self.extra)
+        for name in _FIELD_NAMES:
+            value = getattr(self, name)
+            if name in self.present or (value is not None and (value != [] or name not in _LIST_DEFAULTS)):
+                data[name] = value
+        return data
+
+    @property
+    def address(self):
+        return self.vicinity or self.formatted_address
+
+    @property
+    def phone(self):
+        return self.formatted_phone_number or self.international_phone_number
+
+    @property
+    def hours(self):
+        return list((self.opening_hours or {}).get("weekday_text") or [])
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+            self.present.add(key)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+_FIELD_NAMES = [f.name for f in fields(Business) if f.name not in ("extra", "present")]
+# Fields that default to [] and are left out of to_dict() unless the source had them
+_LIST_DEFAULTS = frozenset(f.name for f in fields(Business) if f.default_factory is list)
+_FIELD_SET = frozenset(_FIELD_NAMES)
@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on in-flight generator agents.
+
+    Every on-time success raises the limit by 1/limit (about +1 per full round of
+    agents). A timeout, a failure, or a success much slower than the smoothed
+    latency multiplies it by decrease_factor. Tasks started before the last cut
+    ran at the old level, so their results do not cut it again.
+    """
+
+    def __init__(self, initial, min_limit=1, max_limit=None, decrease_factor=0.5, latency_factor=2.0):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit or initial))
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.smoothed_latency = None
+        self._limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self._last_decrease = 0
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def record(self, latency, ok, timed_out=False, started_at=None):
+        with self._lock:
+            congested = timed_out or not ok
+            if ok and self.smoothed_latency is not None and latency > self.smoothed_latency * self.latency_factor:
+                congested = True
+            if ok:
+                if self.smoothed_latency is None:
+                    self.smoothed_latency = latency
+                else:
+                    self.smoothed_latency = 0.8 * self.smoothed_latency + 0.2 * latency
+
+            if congested:
+                if started_at is not None and started_at < self._last_decrease:
+                    return
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self._last_decrease = time.time()
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+
+class RunBudget:
+    """Wall-clock and API-call limits for a whole run.
+
+    exhausted() takes the work about to be launched as a reserve, so callers stop
+    before the budget is crossed rather than after.
+    """
+
+    def __init__(self, deadline_seconds=None, max_api_calls=None, api_calls=None):
+        self.deadline_at = time.time() + deadline_seconds if deadline_seconds else None
+        self.max_api_calls = max_api_calls
+        self._api_calls = api_calls
+
+    def time_exhausted(self, reserve_seconds=0):
+        return self.deadline_at is not None and time.time() + reserve_seconds >= self.deadline_at
+
+    def calls_exhausted(self, reserve_calls=0):
+        if self.max_api_calls is None or self._api_calls is None:
+            return False
+        return self._api_calls() + reserve_calls >= self.max_api_calls
+
+    def exhausted(self, reserve_seconds=0, reserve_calls=0):
+        """Return a reason string if the reserved work would not fit, else None."""
+        if self.time_exhausted(reserve_seconds):
+            return "deadline reached"
+        if self.calls_exhausted(reserve_calls):
+            return "API call budget reached"
+        return None
@@ -0,0 +1,180 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from places_cache import CACHE_DIR
+
+load_dotenv()
+
+# Half the side of the square root cell laid over each area (meters)
+AREA_HALF_SIDE_M = float(os.environ.get("AREA_HALF_SIDE_M", "5000"))
+# Deepest split level; depth 4 cells are 1/16 of the root's side
+COVERAGE_MAX_DEPTH = int(os.environ.get("COVERAGE_MAX_DEPTH", "4"))
+# Fully scanned cells become eligible again after this many days
+COVERAGE_TTL_DAYS = float(os.environ.get("COVERAGE_TTL_DAYS", "30"))
+# Searches of a cell that may end on an API error before it waits for the TTL; the wait
+# before each retry starts at COVERAGE_ERROR_BACKOFF_MINUTES and doubles
+COVERAGE_MAX_ERRORS = int(os.environ.get("COVERAGE_MAX_ERRORS", "3"))
+COVERAGE_ERROR_BACKOFF_MINUTES = float(os.environ.get("COVERAGE_ERROR_BACKOFF_MINUTES", "30"))
+
+# Nearby Search never returns more than this many results for one query
+NEARBY_RESULT_CAP = 60
+
+CELL_PENDING = "pending"
+CELL_SCANNED = "scanned"
+CELL_SPLIT = "split"
+CELL_ERROR = "error"
+
+METERS_PER_DEGREE = 111320.0
+
+
+def cell_key(area_key, depth, lat, lng):
+    return f"{area_key}|{depth}|{lat:.5f},{lng:.5f}"
+
+
+def child_cells(lat, lng, half_m):
+    """Centers of the four quadrants of a square cell, each with half the side."""
+    quarter = half_m / 2
+    dlat = quarter / METERS_PER_DEGREE
+    dlng = quarter / (METERS_PER_DEGREE * max(0.01, math.cos(math.radians(lat))))
+    return [(lat + sy * dlat, lng + sx * dlng) for sy in (-1, 1) for sx in (-1, 1)]
+
+
+class CoverageIndex:
+    """Persistent quad-tree of search cells per area and keyword.
+
+    A square cell is searched with the radius of its circumscribed circle. A cell whose
+    search hits the Nearby Search cap is split into four children, so dense areas are
+    tiled finely and sparse ones stay a single query. Unscanned cells go first, then
+    cells whose search failed and whose retry is due, then cells whose last scan is
+    older than COVERAGE_TTL_DAYS.
+    """
+
+    def __init__(self, path=None, max_depth=COVERAGE_MAX_DEPTH, ttl_days=COVERAGE_TTL_DAYS,
+                 max_errors=COVERAGE_MAX_ERRORS, error_backoff_minutes=COVERAGE_ERROR_BACKOFF_MINUTES):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "coverage.sqlite3")
+        self.path = path
+        self.max_depth = max_depth
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.max_errors = max_errors
+        self.error_backoff_seconds = error_backoff_minutes * 60
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS cells (
+                key TEXT PRIMARY KEY,
+                area TEXT NOT NULL,
+                lat REAL NOT NULL,
+                lng REAL NOT NULL,
+                half_m REAL NOT NULL,
+                depth INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                results INTEGER NOT NULL DEFAULT 0,
+                found INTEGER NOT NULL DEFAULT 0,
+                scanned_at REAL,
+                errors INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(cells)")}
+        if "errors" not in columns:
+            self._conn.execute("ALTER TABLE cells ADD COLUMN errors INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cells_area_status ON cells (area, status)")
+        self._conn.commit()
+
+    def _row_to_cell(self, row):
+        key, lat, lng, half_m, depth = row
+        return {
+            "key": key,
+            "lat": lat,
+            "lng": lng,
+            "depth": depth,
+            "half_m": half_m,
+            "radius": round(half_m * math.sqrt(2)),
+        }
+
+    def next_cell(self, area_key, lat, lng):
+        """Return the next cell to search in the area, or None if none is due."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cells (key, area, lat, lng, half_m, depth, status) VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (cell_key(area_key, 0, lat, lng), area_key, lat, lng, AREA_HALF_SIDE_M, CELL_PENDING)
+            )
+            self._conn.commit()
+            row = self._conn.execute(
+                """SELECT key, lat, lng, half_m, depth FROM cells
+                   WHERE area = ? AND status = ?
+                   ORDER BY depth, scanned_at IS NOT NULL, key LIMIT 1""",
+                (area_key, CELL_PENDING)
+            ).fetchone()
+            if row is None:
+                failed = self._conn.execute(
+                    """SELECT key, lat, lng, half_m, depth, errors, scanned_at FROM cells
+                       WHERE area = ? AND status = ? AND errors < ?
+                       ORDER BY scanned_at""",
+                    (area_key, CELL_ERROR, self.max_errors)
+                ).fetchall()
+                row = next(
+                    (r[:5] for r in failed if now - r[6] >= self.error_backoff_seconds * 2 ** (r[5] - 1)), None
+                )
+            if row is None:
+                # Cells that used up their retries get another round once the TTL passes
+                row = self._conn.execute(
+                    """SELECT key, lat, lng, half_m, depth FROM cells
+                       WHERE area = ? AND status IN (?, ?) AND scanned_at < ?
+                       ORDER BY scanned_at LIMIT 1""",
+                    (area_key, CELL_SCANNED, CELL_ERROR, now - self.ttl_seconds)
+                ).fetchone()
+        return self._row_to_cell(row) if row else None
+
+    def record(self, area_key, cell, results, found, exhausted, error=None):
+        """Store a cell's scan; split it if it hit the result cap.
+
+        A scan that ended on an API error marks the cell as failed, to be retried after a
+        backoff. One that stopped before the end of the results for any other reason (goal
+        met or run stopped) leaves the cell pending so the rest of it is searched later.
+        """
+        now = time.time()
+        if error:
+            status = CELL_ERROR
+        elif exhausted and results >= NEARBY_RESULT_CAP and cell["depth"] < self.max_depth:
+            status = CELL_SPLIT
+        elif exhausted:
+            status = CELL_SCANNED
+        else:
+            status = CELL_PENDING
+
+        with self._lock:
+            self._conn.execute(
+                """UPDATE cells SET status = ?, results = ?, found = found + ?, scanned_at = ?,
+                       errors = CASE WHEN ? THEN errors + 1 ELSE 0 END
+                   WHERE key = ?""",
+                (status, results, found, now, status == CELL_ERROR, cell["key"])
+            )
+            if status == CELL_SPLIT:
+                depth = cell["depth"] + 1
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO cells (key, area, lat, lng, half_m, depth, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (cell_key(area_key, depth, child_lat, child_lng), area_key, child_lat, child_lng,
+                         cell["half_m"] / 2, depth, CELL_PENDING)
+                        for child_lat, child_lng in child_cells(cell["lat"], cell["lng"], cell["half_m"])
+                    ]
+                )
+            self._conn.commit()
+        return status
+
+    def stats(self):
+        """Return {status: cell count} across every area."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM cells GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,10 +1,23 @@
 import os
-import subprocess
+import threading
 import time
-import requests
 import json
 import shutil
+import queue
+import hashlib
+import html
+import re
+from datetime import date
+from functools import lru_cache
+from string import Template
+from urllib.parse import quote
 from dotenv import load_dotenv
+from business import Business
+from site_index import get_site_index, BUILD_MARKER
+from http_session import get_session
+from image_pipeline import load_photo_manifest
+from opencode_events import get_event_stream
+from opencode_pool import OpenCodeServerPool
 
 load_dotenv()
 
@@ -19,51 +32,71 @@ OWNER_NAME = os.environ.get("OWNER_NAME", "The LocWeb Team")
 
 OPENCODE_BASE_URL = f"http://{OPENCODE_HOST}:{OPENCODE_PORT}"
 
+# Number of `opencode serve` processes, on consecutive ports starting at OPENCODE_PORT
+OPENCODE_SERVERS = int(os.environ.get("OPENCODE_SERVERS", "1"))
+
+_server_pool = None
+_server_pool_lock = threading.Lock()
+
+OPENCODE_SESSION_TIMEOUT = 600
+
+# "agent" runs an OpenCode session per business; "template" renders the built-in layouts
+WEBSITE_MODE = os.environ.get("WEBSITE_MODE", "agent")
+# Render the built-in layout when an agent session times out
+TEMPLATE_FALLBACK = os.environ.get("TEMPLATE_FALLBACK", "1") != "0"
+SITE_BASE_URL = os.environ.get("SITE_BASE_URL", "https://locweb.vercel.app")
+
+# Slim business facts written for the agent instead of having it read data.json
+AGENT_SUMMARY_FILE = "business.json"
+# Approximate token budget for that summary; lower-priority details are trimmed to fit
+PROMPT_TOKEN_BUDGET = int(os.environ.get("PROMPT_TOKEN_BUDGET", "1200"))
+
+# Seconds between message polls without a live event stream, and as a safety net with one
+POLL_INTERVAL = 3
+EVENT_SAFETY_POLL_INTERVAL = 30
+
 def sanitize_folder_name(name):
     return "".join(c if c.isalnum or c in " -_" else "_" for c in name).strip()[:50]
 
-def is_opencode_server_running():
-    try:
-        response = requests.get(f"{OPENCODE_BASE_URL}/global/health", timeout=2)
-        return response.status_code == 200 and response.json().get("healthy")
-    except:
-        return False
+def get_server_pool():
+    global _server_pool
+    with _server_pool_lock:
+        if _server_pool is None:
+            _server_pool = OpenCodeServerPool(OPENCODE_SERVERS, OPENCODE_HOST, OPENCODE_PORT, OPENCODE_API_KEY)
+    return _server_pool
 
 def ensure_opencode_server_running():
-    if is_opencode_server_running():
-        print(f"OpenCode server already running at {OPENCODE_BASE_URL}")
-        return True
+    return get_server_pool().start()
+
+def fetch_last_message(session_id, base_url=OPENCODE_BASE_URL):
+    """Fetch only the newest message of a session rather than the whole transcript."""
+    response = get_session().get(
+        f"{base_url}/session/{session_id}/message",
+        params={"limit": 1},
+        timeout=10
+    )
+    if response.status_code != 200:
+        return None
+    messages = response.json()
+    return messages[-1] if messages else None
+
+def answer_question(session_id, base_url=OPENCODE_BASE_URL):
+    print("  Agent asked a question - answering automatically...")
     
-    print("Starting OpenCode server...")
-    try:
-        env = os.environ.copy()
-        if OPENCODE_API_KEY:
-            env["OPENCODE_API_KEY"] = OPENCODE_API_KEY
-        
-        subprocess.Popen(
-            ["opencode", "serve", "--hostname", OPENCODE_HOST, "--port", OPENCODE_PORT],
-            env=env,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        
-        for _ in range(10):
-            time.sleep(1)
-            if is_opencode_server_running():
-                print(f"OpenCode server started at {OPENCODE_BASE_URL}")
-                return True
-        
-        print("Failed to start OpenCode server")
-        return False
-    except FileNotFoundError:
-        print("Error: opencode CLI not found. Install from https://opencode.ai/")
-        return False
+    # Send custom answer to continue autonomously
+    answer_response = get_session().post(
+        f"{base_url}/session/{session_id}/custom-answer",
+        json={"answer": "I cannot answer questions. Work autonomously and use your best judgment to make decisions. Do not ask for clarification - proceed with reasonable assumptions."}
+    )
+    
+    if answer_response.status_code != 200:
+        print(f"  Failed to send answer: {answer_response.status_code}")
 
-def run_opencode_session(business_name, prompt, timeout=600):
+def run_opencode_session(business_name, prompt, timeout=OPENCODE_SESSION_TIMEOUT, base_url=OPENCODE_BASE_URL):
     session_id = None
     try:
-        session_response = requests.post(
-            f"{OPENCODE_BASE_URL}/session",
+        session_response = get_session().post(
+            f"{base_url}/session",
             json={"title": f"Generate website for {business_name}"},
             timeout=10
         )
@@ -75,8 +108,12 @@ def run_opencode_session(business_name, prompt, timeout=600):
         session_id = session_response.json().get("id")
         print(f"Created session: {session_id}")
         
-        message_response = requests.post(
-            f"{OPENCODE_BASE_URL}/session/{session_id}/message",
+        # Subscribe before prompting so the completion event cannot be missed
+        events_stream = get_event_stream(base_url)
+        events = events_stream.subscribe(session_id)
+        
+        message_response = get_session().post(
+            f"{base_url}/session/{session_id}/message",
             json={
                 "model": {"providerID": "opencode", "modelID": "minimax-m2.1-free"},
                 "parts": [{"type": "text", "text": prompt}]
@@ -104,39 +141,47 @@ def run_opencode_session(business_name, prompt, timeout=600):
         last_question_time = 0
         
         while time.time() - start_time < timeout:
-            time.sleep(3)
+            # While the event stream is live, polling is only a slow safety net
+            wait = EVENT_SAFETY_POLL_INTERVAL if events_stream.connected.is_set() else POLL_INTERVAL
+            wait = min(wait, max(0, timeout - (time.time() - start_time)))
+            try:
+                event = events.get(timeout=wait)
+            except queue.Empty:
+                event = None
             
-            messages_response = requests.get(
-                f"{OPENCODE_BASE_URL}/session/{session_id}/message",
-                timeout=10
-            )
+            if event is not None:
+                event_type = event.get("type", "")
+                
+                if event_type == "session.idle":
+                    print(f"OpenCode agent completed")
+                    return True, fetch_last_message(session_id, base_url)
+                
+                if event_type == "session.error":
+                    error = (event.get("properties") or {}).get("error")
+                    print(f"OpenCode session error: {error}")
+                    return False, f"Session error: {error}"
+                
+                if event_type.startswith("question."):
+                    if time.time() - last_question_time > 10:
+                        last_question_time = time.time()
+                        answer_question(session_id, base_url)
+                continue
             
-            if messages_response.status_code == 200:
-                messages = messages_response.json()
-                if messages and len(messages) > 0:
-                    last_msg = messages[-1]
-                    msg_type = last_msg.get("info", {}).get("type", "")
-                    
-                    if msg_type == "assistant":
-                        print(f"OpenCode agent completed")
-                        return True, last_msg
-                    
-                    # Handle questions - auto-answer to continue execution
-                    if msg_type == "question":
-                        current_time = time.time()
-                        # Avoid flooding with answers - only answer once per 10 seconds per question
-                        if current_time - last_question_time > 10:
-                            print("  Agent asked a question - answering automatically...")
-                            last_question_time = current_time
-                            
-                            # Send custom answer to continue autonomously
-                            answer_response = requests.post(
-                                f"{OPENCODE_BASE_URL}/session/{session_id}/custom-answer",
-                                json={"answer": "I cannot answer questions. Work autonomously and use your best judgment to make decisions. Do not ask for clarification - proceed with reasonable assumptions."}
-                            )
-                            
-                            if answer_response.status_code != 200:
-                                print(f"  Failed to send answer: {answer_response.status_code}")
+            last_msg = fetch_last_message(session_id, base_url)
+            if last_msg:
+                msg_type = last_msg.get("info", {}).get("type", "")
+                
+                if msg_type == "assistant":
+                    print(f"OpenCode agent completed")
+                    return True, last_msg
+                
+                # Handle questions - auto-answer to continue execution
+                if msg_type == "question":
+                    current_time = time.time()
+                    # Avoid flooding with answers - only answer once per 10 seconds per question
+                    if current_time - last_question_time > 10:
+                        last_question_time = current_time
+                        answer_question(session_id, base_url)
             
             print(f"  Still working...")
         
@@ -150,8 +195,9 @@ def run_opencode_session(business_name, prompt, timeout=600):
     
     finally:
         if session_id:
+            get_event_stream(base_url).unsubscribe(session_id)
             try:
-                delete_response = requests.delete(f"{OPENCODE_BASE_URL}/session/{session_id}")
+                delete_response = get_session().delete(f"{base_url}/session/{session_id}")
                 if delete_response.status_code == 200:
                     print(f"Cleaned up session: {session_id}")
                 else:
@@ -159,91 +205,109 @@ def run_opencode_session(business_name, prompt, timeout=600):
             except Exception as e:
                 print(f"Error cleaning up session: {e}")
 
-def generate_prompt_for_opencode(business_data, folder_path, slug):
-    name = business_data.get("name") or "Our Business"
-    address = business_data.get("vicinity") or business_data.get("formatted_address") or "Visit us in person"
-    phone = business_data.get("formatted_phone_number") or business_data.get("international_phone_number") or "Call us"
-    rating = business_data.get("rating") or "N/A"
-    reviews = business_data.get("user_ratings_total") or "0"
-    price_level = business_data.get("price_level")
+def extract_business_fields(business_data, folder_path):
+    """Pull the display fields shared by the agent prompt and the template renderer."""
+    business = Business.from_places(business_data)
+    hours_list = business.hours
     
-    types_raw = business_data.get("types", "")
-    if isinstance(types_raw, str) and types_raw.startswith("[") and types_raw.endswith("]"):
-        import ast
-        try:
-            types = ast.literal_eval(types_raw)
-        except:
-            types = [t.strip() for t in types_raw.strip("[]").split(",") if t.strip()]
-    elif isinstance(types_raw, list):
-        types = types_raw
-    else:
-        types = [t.strip() for t in str(types_raw).split(",") if t.strip()]
-    
-    reviews_list_raw = business_data.get("reviews", "")
-    if isinstance(reviews_list_raw, str) and reviews_list_raw.startswith("["):
-        import ast
-        try:
-            reviews_list = ast.literal_eval(reviews_list_raw)
-        except:
-            reviews_list = []
-    elif isinstance(reviews_list_raw, list):
-        reviews_list = reviews_list_raw
-    else:
-        reviews_list = []
-    
-    positive_reviews = [r for r in reviews_list if isinstance(r.get("rating"), (int, float)) and r.get("rating", 0) >= 4]
-    
-    photo_urls_raw = business_data.get("photo_urls", "")
-    if isinstance(photo_urls_raw, str) and "|||" in photo_urls_raw:
-        photo_urls = photo_urls_raw.split("|||")
-    elif isinstance(photo_urls_raw, list):
-        photo_urls = photo_urls_raw
-    elif isinstance(photo_urls_raw, str) and photo_urls_raw.startswith("["):
-        import ast
-        try:
-            photo_urls = ast.literal_eval(photo_urls_raw)
-        except:
-            photo_urls = []
-    else:
-        photo_urls = []
-    
-    hours_data = business_data.get("opening_hours")
-    if hours_data:
-        if isinstance(hours_data, dict) and "weekday_text" in hours_data:
-            opening_hours = "; ".join(hours_data["weekday_text"])
-        else:
-            opening_hours = str(hours_data)
-    else:
-        opening_hours = "Not available"
-    
-    review_texts = ""
-    if isinstance(positive_reviews, list) and len(positive_reviews) > 0:
-        sample_reviews = positive_reviews[:3]
-        review_texts = "\n**Positive customer reviews (4+ stars):**\n"
-        for r in sample_reviews:
-            author = r.get("author_name", "Customer")
-            text = r.get("text", "")[:200]
-            rating = r.get("rating", "")
-            review_texts += f"- {author} ({rating} stars): \"{text}...\"\n"
-    else:
-        review_texts = "\nNo positive reviews available."
+    return {
+        "name": business.name or "Our Business",
+        "address": business.address or "Visit us in person",
+        "phone": business.phone or "Call us",
+        "rating": business.rating or "N/A",
+        "reviews": business.user_ratings_total or "0",
+        "price": "$" * int(business.price_level) if business.price_level and business.price_level != "N/A" else "Not specified",
+        "types": business.types,
+        "positive_reviews": [
+            r for r in business.reviews
+            if isinstance(r.get("rating"), (int, float)) and r.get("rating", 0) >= 4
+        ],
+        "photo_urls": business.photo_urls,
+        "hours_list": hours_list,
+        "opening_hours": "; ".join(hours_list) if hours_list else "Not available",
+        "local_photos": business.local_photos or [],
+        "responsive_photos": load_photo_manifest(folder_path),
+        "maps_url": business.url or "",
+    }
+
+def estimate_tokens(value):
+    """Rough token count (~4 characters per token) of a string or JSON-serializable value."""
+    text = value if isinstance(value, str) else json.dumps(value, separators=(",", ":"))
+    return len(text) // 4 + 1
+
+def _trim_reviews(length, keep):
+    def reduce(summary):
+        summary["reviews"] = [dict(r, text=r["text"][:length]) for r in summary.get("reviews", [])[:keep]]
+    return reduce
+
+def _drop(key):
+    def reduce(summary):
+        summary.pop(key, None)
+    return reduce
+
+def _drop_srcsets(summary):
+    summary["photos"] = [
+        {k: v for k, v in p.items() if not k.endswith("srcset")} if isinstance(p, dict) else p
+        for p in summary.get("photos", [])
+    ]
+
+def _keep_photos(count):
+    def reduce(summary):
+        summary["photos"] = summary.get("photos", [])[:count]
+    return reduce
+
+# Applied in order until the summary fits the token budget: least useful detail goes first
+SUMMARY_REDUCTIONS = [
+    _trim_reviews(200, 3),
+    _drop("types"),
+    _trim_reviews(120, 2),
+    _keep_photos(3),
+    _drop_srcsets,
+    _trim_reviews(80, 1),
+    _drop("hours"),
+    _drop("reviews"),
+]
+
+def build_agent_summary(fields, token_budget=PROMPT_TOKEN_BUDGET):
+    """The facts an agent needs, without raw API fields, cut down to token_budget."""
+    photos = fields["responsive_photos"] or fields["local_photos"]
+    summary = {
+        "name": fields["name"],
+        "address": fields["address"],
+        "phone": fields["phone"],
+        "rating": fields["rating"],
+        "review_count": fields["reviews"],
+        "price_level": fields["price"],
+        "types": [t for t in fields["types"] if t not in ("point_of_interest", "establishment")],
+        "hours": fields["hours_list"],
+        "reviews": [
+            {"author": r.get("author_name", "Customer"), "rating": r.get("rating"), "text": (r.get("text") or "")[:400]}
+            for r in fields["positive_reviews"][:5]
+        ],
+        "photos": [
+            {k: p[k] for k in ("src", "width", "height", "webp_srcset", "jpeg_srcset")} if isinstance(p, dict) else p
+            for p in photos[:5]
+        ],
+        "google_maps_url": fields["maps_url"],
+    }
+    for reduce in SUMMARY_REDUCTIONS:
+        if estimate_tokens(summary) <= token_budget:
+            break
+        reduce(summary)
+    return {k: v for k, v in summary.items() if v not in ("", [], None)}
+
+def generate_prompt_for_opencode(business_data, folder_path, slug):
+    """Write the agent's business.json summary into folder_path and return the prompt that points to it."""
+    fields = extract_business_fields(business_data, folder_path)
+    summary = build_agent_summary(fields)
+    with open(os.path.join(folder_path, AGENT_SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=1, ensure_ascii=False)
     
-    local_photos = business_data.get("local_photos", [])
     photos_section = ""
-    if local_photos:
-        photos_section = f"\n**Local Photos ({len(local_photos)} available - USE THESE PATHS):**\n" + "\n".join([f"- {url}" for url in local_photos[:3]])
+    if summary.get("photos") and isinstance(summary["photos"][0], dict) and "webp_srcset" in summary["photos"][0]:
+        photos_section = "\nRender each photo as a <picture> with the WebP srcset as a <source>, the JPEG srcset on the <img>, explicit width/height, and loading=\"lazy\" for images below the fold."
     
-    prompt = f"""You are an expert web developer creating a complete HTML website for a local business.
-
-**Business Information:**
-- Name: {name}
-- Address: {address}
-- Phone: {phone}
-- Rating: {rating}/5 ({reviews} reviews)
-- Price Level: {"$" * int(price_level) if price_level and price_level != "N/A" else "Not specified"}
-- Business Types: {", ".join(types) if types else "Restaurant"}
-- Opening Hours: {opening_hours}
-{review_texts}{photos_section}
+    prompt = f"""You are an expert web developer creating a complete HTML website for {fields["name"]}, a local business.
 
 **IMPORTANT: Work in this directory: {folder_path}**
 
@@ -252,12 +316,12 @@ def generate_prompt_for_opencode(business_data, folder_path, slug):
 Follow the detailed instructions in AGENTS.md to create a professional HTML website.
 
 **Key Requirements:**
-- READ data.json to understand the business
+- READ {AGENT_SUMMARY_FILE} for everything about the business: contact details, rating, hours, positive reviews and photos (do not read data.json, it only holds raw API data)
 - MODIFY index.html to create a complete website
 - Include hero section, business info, photo gallery, footer
 - Use Tailwind CSS for all styling
 - Make it responsive and professional
-- Use LOCAL photo paths from data.json (e.g., "photos/photo-1.jpg") - NOT Google Maps URLs
+- Use the LOCAL photo paths from {AGENT_SUMMARY_FILE} (e.g., "photos/photo-1.jpg") - NOT Google Maps URLs{photos_section}
 - Make all links functional
 
 **Critical Rules:**
@@ -265,23 +329,198 @@ Follow the detailed instructions in AGENTS.md to create a professional HTML webs
 - DO NOT delete existing files
 - Only modify index.html and create phone_pitch.txt
 - Follow AGENTS.md instructions exactly
-- CRITICAL: Use the local photo paths provided in data.json, NOT the Google Maps URLs
 - CRITICAL: DO NOT ASK QUESTIONS. Make all decisions autonomously. Do not stop to ask for clarification. If information is missing, make a reasonable assumption and proceed.
 
 After modifying index.html and creating phone_pitch.txt, verify everything is complete and professional."""
+    print(f"Prompt ~{estimate_tokens(prompt)} tokens, {AGENT_SUMMARY_FILE} ~{estimate_tokens(summary)} tokens")
     return prompt
 
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+def business_fingerprints(business_data):
+    """Stable hashes of what a site is built from: the prompt's text fields and the photo set.
+
+    Photos are identified by size and attribution because photo references are opaque
+    tokens that may change between requests for the same photo.
+    """
+    business = Business.from_places(business_data)
+    content = {
+        "name": business.name,
+        "address": business.address,
+        "phone": business.phone,
+        "rating": business.rating,
+        "reviews_total": business.user_ratings_total,
+        "price_level": business.price_level,
+        "types": business.types,
+        "hours": (business.opening_hours or {}).get("weekday_text"),
+        "reviews": sorted(
+            ((r.get("author_name"), r.get("time"), r.get("rating"), r.get("text")) for r in business.reviews),
+            key=str
+        ),
+        "status": business.business_status,
+    }
+    photos = [(p.get("width"), p.get("height"), p.get("html_attributions")) for p in business.photos[:5]]
+    return {"content": _digest(content), "photos": _digest(photos)}
+
+# Look and copy for the template renderer, keyed by Google place type; first match wins
+LAYOUTS = {
+    "bakery": {"accent": "rose", "category": "Bakery", "tagline": "Baked fresh every morning", "cta": "Call to Order"},
+    "cafe": {"accent": "amber", "category": "Cafe", "tagline": "Great coffee and a place to slow down", "cta": "Call Us"},
+    "bar": {"accent": "indigo", "category": "Bar", "tagline": "Good drinks, good company", "cta": "Call Us"},
+    "meal_takeaway": {"accent": "red", "category": "Takeout", "tagline": "Hot food, ready when you are", "cta": "Call to Order"},
+    "restaurant": {"accent": "orange", "category": "Restaurant", "tagline": "Fresh food and friendly service", "cta": "Call to Order"},
+    "hair_care": {"accent": "slate", "category": "Barber & Salon", "tagline": "Sharp cuts and classic service", "cta": "Book by Phone"},
+    "beauty_salon": {"accent": "pink", "category": "Beauty Salon", "tagline": "Look and feel your best", "cta": "Book by Phone"},
+    "store": {"accent": "emerald", "category": "Local Shop", "tagline": "Your neighborhood shop", "cta": "Call Us"},
+}
+DEFAULT_LAYOUT = {"accent": "blue", "category": "Local Business", "tagline": "Proudly serving the neighborhood", "cta": "Call Us"}
+
+# Service flags from Place Details shown as badges
+FEATURE_LABELS = {"dine_in": "Dine-in", "takeout": "Takeout", "delivery": "Delivery", "reservable": "Reservations", "curbside_pickup": "Curbside pickup"}
+
+@lru_cache(maxsize=None)
+def load_template(filename):
+    """Read and compile a template once per process."""
+    with open(os.path.join(TEMPLATE_DIR, filename), "r", encoding="utf-8") as f:
+        return Template(f.read())
+
+def pick_layout(types):
+    for place_type in types:
+        if place_type in LAYOUTS:
+            return LAYOUTS[place_type]
+    return DEFAULT_LAYOUT
+
+def city_from_address(address):
+    parts = [p.strip() for p in address.split(",") if p.strip()]
+    return parts[-1] if len(parts) > 1 else "your area"
+
+def render_photo(photo, alt, eager=False):
+    loading = "eager" if eager else "lazy"
+    if isinstance(photo, dict):
+        return (
+            f'<picture><source type="image/webp" srcset="{html.escape(photo["webp_srcset"])}">'
+            f'<img src="{html.escape(photo["src"])}" srcset="{html.escape(photo["jpeg_srcset"])}" '
+            f'width="{photo["width"]}" height="{photo["height"]}" alt="{alt}" loading="{loading}" '
+            f'class="w-full h-72 object-cover rounded-2xl shadow-lg"></picture>'
+        )
+    return f'<img src="{html.escape(photo)}" alt="{alt}" loading="{loading}" class="w-full h-72 object-cover rounded-2xl shadow-lg">'
+
+def render_website_from_template(business_data, folder_path, slug):
+    """Write index.html and phone_pitch.txt from the built-in layouts, without an agent."""
+    fields = extract_business_fields(business_data, folder_path)
+    layout = pick_layout(fields["types"])
+    esc = html.escape
+    name = esc(fields["name"])
+    city = city_from_address(fields["address"])
+    photos = fields["responsive_photos"] or fields["local_photos"]
+    
+    rating_badge = ""
+    if fields["rating"] != "N/A":
+        rating_badge = f'<p class="text-lg font-semibold">&#9733; {esc(str(fields["rating"]))} / 5 <span class="text-gray-600 font-normal">({esc(str(fields["reviews"]))} Google reviews)</span></p>'
+    
+    hours = "\n        ".join(
+        f'<li class="px-6 py-3 flex justify-between"><span class="font-medium">{esc(day)}</span><span class="text-gray-600">{esc(times.strip())}</span></li>'
+        for day, _, times in (line.partition(":") for line in fields["hours_list"])
+    ) or '<li class="px-6 py-3 text-center text-gray-600">Call us for current hours</li>'
+    
+    gallery = "\n        ".join(
+        render_photo(photo, f"{name} photo {i + 1}") for i, photo in enumerate(photos[:6])
+    ) or f'<p class="col-span-full text-center text-gray-600">Stop by {name} and see for yourself.</p>'
+    
+    reviews = "\n        ".join(
+        f'<blockquote class="bg-white rounded-2xl shadow p-6"><p class="text-gray-700 mb-4">&ldquo;{esc(r.get("text", "")[:300])}&rdquo;</p>'
+        f'<footer class="font-semibold">{esc(r.get("author_name", "Customer"))} &middot; {"&#9733;" * int(r.get("rating", 0))}</footer></blockquote>'
+        for r in fields["positive_reviews"][:3]
+    ) or '<p class="col-span-full text-center text-gray-600">Be the first to leave a review on Google.</p>'
+    
+    features = " ".join(
+        f'<span class="inline-block bg-gray-100 text-gray-800 px-4 py-2 rounded-full text-sm font-medium">{label}</span>'
+        for key, label in FEATURE_LABELS.items() if business_data.get(key)
+    )
+    if features:
+        features = f'<div class="flex flex-wrap justify-center gap-3 mt-8">{features}</div>'
+    
+    about = (
+        f"{name} is a {esc(layout['category'].lower())} in {esc(city)}"
+        + (f", rated {esc(str(fields['rating']))} out of 5 by {esc(str(fields['reviews']))} customers on Google" if fields["rating"] != "N/A" else "")
+        + f". Drop by at {esc(fields['address'])} or give us a call at {esc(fields['phone'])}."
+    )
+    
+    page = load_template("site.html").substitute(
+        name=name,
+        city=esc(city),
+        address=esc(fields["address"]),
+        phone=esc(fields["phone"]),
+        phone_digits=re.sub(r"[^0-9+]", "", fields["phone"]),
+        maps_url=esc(fields["maps_url"] or f"https://www.google.com/maps/search/?api=1&query={quote(fields['name'] + ' ' + fields['address'])}"),
+        accent=layout["accent"],
+        category=esc(layout["category"]),
+        tagline=esc(layout["tagline"]),
+        cta=esc(layout["cta"]),
+        rating_badge=rating_badge,
+        hero_image=render_photo(photos[0], name, eager=True) if photos else "",
+        about=about,
+        features=features,
+        hours=hours,
+        gallery=gallery,
+        reviews=reviews,
+        year=date.today().year,
+    )
+    
+    if fields["positive_reviews"]:
+        quote_text = fields["positive_reviews"][0].get("text", "").strip().split(". ")[0][:160]
+        research = f"Your customers clearly love you - one review said '{quote_text}'. That kind of word of mouth deserves a website to match."
+    elif fields["rating"] != "N/A":
+        research = f"You've got a {fields['rating']}-star rating from {fields['reviews']} reviews on Google - people clearly like what you're doing."
+    else:
+        research = f"I came across {fields['name']} on Google Maps and noticed you don't have a website yet."
+    
+    pitch = load_template("phone_pitch.txt").substitute(
+        name=fields["name"],
+        city=city,
+        owner_name=OWNER_NAME,
+        owner_email=OWNER_EMAIL,
+        research=research,
+        demo_url=f"{SITE_BASE_URL}/web/{quote(slug)}",
+    )
+    
+    with open(os.path.join(folder_path, "index.html"), "w", encoding="utf-8") as f:
+        f.write(page)
+    with open(os.path.join(folder_path, "phone_pitch.txt"), "w", encoding="utf-8") as f:
+        f.write(pitch)
+
+def remove_agent_files(folder_path):
+    """Clear the agent's working files and the build marker once the site is finished."""
+    for filename in ("AGENTS.md", AGENT_SUMMARY_FILE, BUILD_MARKER):
+        path = os.path.join(folder_path, filename)
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+                print(f"Cleaned up {filename}")
+            except Exception as e:
+                print(f"Error removing {filename}: {e}")
+
+def write_business_data(business_data, folder_path):
+    """Write data.json with the owner contact and current fingerprints, replacing it atomically."""
+    business_data["owner_email"] = OWNER_EMAIL
+    business_data["owner_name"] = OWNER_NAME
+    business_data["fingerprints"] = business_fingerprints(business_data)
+    
+    data_path = os.path.join(folder_path, "data.json")
+    with open(data_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(Business.from_places(business_data).to_dict(), f, indent=2)
+    os.replace(data_path + ".tmp", data_path)
+    get_site_index().refresh(os.path.basename(folder_path))
+
 def create_business_folder(business_data, slug, photo_paths):
     folder_path = os.path.join(PUBLIC_BUSINESSES_DIR, slug)
     os.makedirs(folder_path, exist_ok=True)
     os.makedirs(os.path.join(folder_path, "photos"), exist_ok=True)
+    open(os.path.join(folder_path, BUILD_MARKER), "w").close()
     
-    business_data["owner_email"] = OWNER_EMAIL
-    business_data["owner_name"] = OWNER_NAME
     business_data["local_photos"] = photo_paths
-    
-    with open(os.path.join(folder_path, "data.json"), "w", encoding="utf-8") as f:
-        json.dump(business_data, f, indent=2)
+    write_business_data(business_data, folder_path)
     
     index_src = os.path.join(TEMPLATE_DIR, "index.html")
     agents_src = os.path.join(TEMPLATE_DIR, "AGENTS.md")
@@ -294,51 +533,104 @@ def create_business_folder(business_data, slug, photo_paths):
     
     return folder_path
 
-def generate_website_for_business(business_data, photo_paths=None, use_opencode=True):
+# Files a regeneration overwrites and restores if it fails
+SITE_FILES = ("index.html", "phone_pitch.txt", "data.json")
+
+def stash_built_site(folder_path):
+    """Return the contents of a finished site's files, or None if the folder holds no built site."""
+    if not os.path.exists(os.path.join(folder_path, "index.html")) or os.path.exists(os.path.join(folder_path, BUILD_MARKER)):
+        return None
+    stash = {}
+    for filename in SITE_FILES:
+        try:
+            with open(os.path.join(folder_path, filename), "rb") as f:
+                stash[filename] = f.read()
+        except OSError:
+            pass
+    return stash
+
+def restore_built_site(folder_path, stash):
+    """Put back the files saved by stash_built_site after a failed regeneration."""
+    for filename, content in stash.items():
+        path = os.path.join(folder_path, filename)
+        with open(path + ".tmp", "wb") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+    remove_agent_files(folder_path)
+    get_site_index().refresh(os.path.basename(folder_path))
+    print(f"Restored the previous site in {folder_path}")
+
+def generate_website_for_business(business_data, photo_paths=None, use_opencode=True, mode=None):
+    """Build the site for one business and return (slug, fallback).
+
+    slug is None on failure. fallback is the agent's failure reason when the site was
+    rendered from the template instead, so callers can still count the agent as failed.
+    When an already built site is regenerated and the agent fails, its previous files
+    are restored rather than leaving the stub page or a generic template in place.
+    """
+    business_data = Business.from_places(business_data)
     name = business_data.get("name") or "Unknown Business"
-    slug = sanitize_folder_name(name)
+    slug = business_data.get("slug") or sanitize_folder_name(name)
+    mode = mode or WEBSITE_MODE
     
     if business_data.get("website"):
         print(f"Skipping {name} - already has a website")
-        return None
+        return None, None
     
     print(f"Curating website for: {name} (slug: {slug})")
     
+    if mode == "template":
+        folder_path = create_business_folder(business_data, slug, photo_paths or [])
+        render_website_from_template(business_data, folder_path, slug)
+        remove_agent_files(folder_path)
+        get_site_index().refresh(slug)
+        print(f"Rendered website from template for: {name}")
+        return slug, None
+    
     if not use_opencode or not OPENCODE_API_KEY:
         folder_path = os.path.join(PUBLIC_BUSINESSES_DIR, slug)
         os.makedirs(folder_path, exist_ok=True)
         print(f"Folder created at {folder_path}")
         if not OPENCODE_API_KEY:
             print("Note: OPENCODE_API_KEY not set - website not generated")
-        return None
+        return None, None
     
     if not ensure_opencode_server_running():
         print("Could not start OpenCode server, skipping AI customization")
-        return None
+        return None, None
     
+    previous = stash_built_site(os.path.join(PUBLIC_BUSINESSES_DIR, slug))
     folder_path = create_business_folder(business_data, slug, photo_paths or [])
     print(f"Created business folder: {folder_path}")
     
     prompt = generate_prompt_for_opencode(business_data, folder_path, slug)
-    success, result = run_opencode_session(name, prompt)
+    with get_server_pool().lease() as base_url:
+        if base_url is None:
+            print("No healthy OpenCode server available")
+            if previous:
+                restore_built_site(folder_path, previous)
+            return None, None
+        success, result = run_opencode_session(name, prompt, base_url=base_url)
     
     if success:
         print("OpenCode agent completed successfully")
-        
-        agents_path = os.path.join(folder_path, "AGENTS.md")
-        if os.path.exists(agents_path):
-            try:
-                os.remove(agents_path)
-                print("Cleaned up AGENTS.md")
-            except Exception as e:
-                print(f"Error removing AGENTS.md: {e}")
-                
+        remove_agent_files(folder_path)
         print(f"Generated website for: {name}")
+    elif TEMPLATE_FALLBACK and result == "Timeout" and not previous:
+        print("OpenCode agent timed out - falling back to the template renderer")
+        render_website_from_template(business_data, folder_path, slug)
+        remove_agent_files(folder_path)
+        get_site_index().refresh(slug)
+        print(f"Rendered website from template for: {name}")
+        return slug, result
     else:
         print(f"OpenCode agent failed: {result}")
-        return None
+        if previous:
+            restore_built_site(folder_path, previous)
+        return None, None
     
-    return slug
+    get_site_index().refresh(slug)
+    return slug, None
 
 def main():
     print("Website Generator for Local Businesses")
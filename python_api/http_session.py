@@ -0,0 +1,70 @@
+import os
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# (connect, read) seconds applied to every request that does not pass its own timeout
+DEFAULT_TIMEOUT = (5, 30)
+
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30
+
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+_session = None
+_pool_size = 10
+_session_lock = threading.Lock()
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given 0-based retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class TimeoutSession(requests.Session):
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+def _mount_adapters(session, pool_size):
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=BACKOFF_BASE,
+        backoff_max=BACKOFF_MAX,
+        backoff_jitter=BACKOFF_BASE,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=["GET", "HEAD", "DELETE"],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry))
+    # Plain http is only the local OpenCode server; a refused connection there means it is down
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0))
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = TimeoutSession()
+                _mount_adapters(session, _pool_size)
+                _session = session
+    return _session
+
+
+def configure_pool_size(pool_size):
+    """Size the per-host connection pools, e.g. to the number of parallel workers."""
+    global _pool_size
+    with _session_lock:
+        _pool_size = max(1, int(pool_size))
+        if _session is not None:
+            _mount_adapters(_session, _pool_size)
@@ -0,0 +1,112 @@
+import atexit
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+load_dotenv()
+
+RESPONSIVE_WIDTHS = [int(w) for w in os.environ.get("PHOTO_WIDTHS", "400,800").split(",") if w.strip()]
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", str(os.cpu_count() or 2)))
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+MANIFEST_NAME = "manifest.json"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Spawn rather than fork: the pool starts lazily while search threads hold locks
+                _pool = ProcessPoolExecutor(max_workers=max(1, IMAGE_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+                atexit.register(_pool.shutdown)
+    return _pool
+
+
+def _render_variants(src_path, widths):
+    """Write WebP and JPEG variants of src_path next to it; runs in a worker process."""
+    photos_dir = os.path.dirname(src_path)
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+
+    with Image.open(src_path) as im:
+        # Apply EXIF rotation before metadata is dropped by re-encoding
+        im = ImageOps.exif_transpose(im).convert("RGB")
+        orig_width, orig_height = im.size
+
+        targets = sorted({w for w in widths if w < orig_width} | {min(max(widths), orig_width)})
+        webp, jpeg = [], []
+        for width in targets:
+            height = round(orig_height * width / orig_width)
+            resized = im if width == orig_width else im.resize((width, height), Image.LANCZOS)
+
+            webp_name = f"{stem}-{width}.webp"
+            resized.save(os.path.join(photos_dir, webp_name), "WEBP", quality=WEBP_QUALITY, method=4)
+            webp.append({"path": f"photos/{webp_name}", "width": width})
+
+            jpeg_name = f"{stem}-{width}.jpg"
+            resized.save(os.path.join(photos_dir, jpeg_name), "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+            jpeg.append({"path": f"photos/{jpeg_name}", "width": width})
+
+    largest = jpeg[-1]
+    return {
+        "original": f"photos/{os.path.basename(src_path)}",
+        "src": largest["path"],
+        "width": largest["width"],
+        "height": round(orig_height * largest["width"] / orig_width),
+        "webp_srcset": ", ".join(f"{v['path']} {v['width']}w" for v in webp),
+        "jpeg_srcset": ", ".join(f"{v['path']} {v['width']}w" for v in jpeg),
+    }
+
+
+def optimize_business_photos(folder_path, local_paths):
+    """Produce responsive variants for downloaded photos and write photos/manifest.json.
+
+    Returns the manifest entries, or [] when Pillow is not installed.
+    """
+    if Image is None:
+        print("    Pillow not installed - skipping image optimization")
+        return []
+    if not local_paths:
+        return []
+
+    pool = _get_pool()
+    futures = [
+        (path, pool.submit(_render_variants, os.path.join(folder_path, path), RESPONSIVE_WIDTHS))
+        for path in local_paths
+    ]
+
+    entries = []
+    for path, future in futures:
+        try:
+            entries.append(future.result())
+        except Exception as e:
+            print(f"    Error optimizing {path}: {e}")
+
+    manifest_path = os.path.join(folder_path, "photos", MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"photos": entries}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    print(f"    Optimized {len(entries)} photo(s) into {len(RESPONSIVE_WIDTHS)} width(s)")
+    return entries
+
+
+def load_photo_manifest(folder_path):
+    try:
+        with open(os.path.join(folder_path, "photos", MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f).get("photos", [])
+    except (OSError, ValueError):
+        return []
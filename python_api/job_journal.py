@@ -0,0 +1,95 @@
+import json
+import os
+import threading
+import time
+from places_cache import CACHE_DIR
+from business import Business
+
+STATE_DISCOVERED = "discovered"
+STATE_PHOTOS = "photos_downloaded"
+STATE_GENERATING = "generating"
+STATE_DONE = "done"
+STATE_FAILED = "failed"
+
+# Failed jobs are retried on --resume until they have been attempted this many times
+MAX_ATTEMPTS = 3
+
+
+class JobJournal:
+    """Append-only JSONL log of each business's progress through the pipeline.
+
+    Every state change is one fsync'd line, so a crash loses at most the line being
+    written. Replaying the file gives the latest state of every job.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "jobs.jsonl")
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, business, state, reason=None):
+        entry = {
+            "place_id": business.get("place_id"),
+            "slug": business.get("slug"),
+            "state": state,
+            "ts": time.time(),
+        }
+        if reason:
+            entry["reason"] = str(reason)[:500]
+        if state in (STATE_DISCOVERED, STATE_PHOTOS):
+            entry["business"] = business.to_dict() if isinstance(business, Business) else business
+
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        """Replay the journal into {place_id: job} with the latest state and business data."""
+        jobs = {}
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except OSError:
+            return jobs
+
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    continue
+                job = jobs.setdefault(entry.get("place_id"), {"attempts": 0})
+                if entry.get("business"):
+                    job["business"] = entry["business"]
+                # Compacted lines carry the count already, including their own attempt
+                if "attempts" in entry:
+                    job["attempts"] = entry["attempts"]
+                elif entry["state"] == STATE_GENERATING:
+                    job["attempts"] += 1
+                job["state"] = entry["state"]
+                job["slug"] = entry.get("slug") or job.get("slug")
+                job["reason"] = entry.get("reason")
+        return jobs
+
+    def compact(self, jobs):
+        """Rewrite the journal with one line per job; finished jobs drop their business data."""
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for place_id, job in jobs.items():
+                    entry = {"place_id": place_id, "slug": job.get("slug"), "state": job["state"], "ts": time.time()}
+                    if job.get("reason"):
+                        entry["reason"] = job["reason"]
+                    if job["state"] != STATE_DONE and job.get("business"):
+                        entry["business"] = job["business"]
+                    # Keep the attempt count across compactions
+                    entry["attempts"] = job.get("attempts", 0)
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
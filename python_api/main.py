@@ -1,15 +1,53 @@
 import os
 import sys
+import argparse
+import shutil
 import random
 import json
+import threading
+import queue
+import time
+from contextlib import closing
 from urllib.parse import unquote
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
-from maps_client import GoogleMapsClient, download_photos_locally, sanitize_folder_name, DEFAULT_LAT, DEFAULT_LNG
-from generate_website import generate_website_for_business, PUBLIC_BUSINESSES_DIR
+from business import Business
+from maps_client import GoogleMapsClient, download_photos_locally, sanitize_folder_name, DEFAULT_LAT, DEFAULT_LNG, MAX_PHOTOS
+from generate_website import (
+    generate_website_for_business, business_fingerprints, write_business_data,
+    PUBLIC_BUSINESSES_DIR, OPENCODE_SESSION_TIMEOUT, WEBSITE_MODE, BUILD_MARKER
+)
+from places_cache import PlacesCache
+from photo_store import PHOTO_DOWNLOAD_CONCURRENCY
+from place_index import PlaceIndex
+from http_session import configure_pool_size
+from rate_limiter import get_rate_limiter
+from coverage_index import CoverageIndex, CELL_PENDING, CELL_SPLIT, CELL_ERROR, NEARBY_RESULT_CAP
+from area_scheduler import AreaScheduler
+from scan_log import ScanLog
+from image_pipeline import optimize_business_photos
+from concurrency import AIMDController, RunBudget
+from site_index import get_site_index
+from job_journal import JobJournal, STATE_DISCOVERED, STATE_PHOTOS, STATE_GENERATING, STATE_DONE, STATE_FAILED, MAX_ATTEMPTS
 
 load_dotenv()
 
+# Number of areas scanned at the same time during Phase 1
+AREA_SCAN_CONCURRENCY = int(os.environ.get("AREA_SCAN_CONCURRENCY", "4"))
+
+# Coverage cells searched in one area before moving on to another
+AREA_CELLS_PER_VISIT = int(os.environ.get("AREA_CELLS_PER_VISIT", "4"))
+
+# Visits in a row that queue nothing and finish no cell before an area is dropped for the run
+AREA_MAX_STALLED_VISITS = int(os.environ.get("AREA_MAX_STALLED_VISITS", "3"))
+
+# Seconds between checks for newly ready businesses while agents are running
+POOL_POLL_INTERVAL = 0.25
+
+# Bounds for the adaptive number of generator agents; MAX defaults to twice the starting count
+MIN_PARALLEL_AGENTS = int(os.environ.get("MIN_PARALLEL_AGENTS", "1"))
+MAX_PARALLEL_AGENTS = int(os.environ.get("MAX_PARALLEL_AGENTS", "0"))
+
 US_AREAS = [
     {"city": "Boston, MA", "lat": 42.3601, "lng": -71.0589},
     {"city": "Cambridge, MA", "lat": 42.3736, "lng": -71.1097},
@@ -61,20 +99,8 @@ US_AREAS = [
     {"city": "San Antonio, TX", "lat": 29.4241, "lng": -98.4936},
 ]
 
-def get_random_area():
-    area = random.choice(US_AREAS)
-    return area["lat"], area["lng"], area["city"]
-
 def get_already_curated_slugs():
-    slugs = set()
-    if os.path.exists(PUBLIC_BUSINESSES_DIR):
-        for item in os.listdir(PUBLIC_BUSINESSES_DIR):
-            slug_path = os.path.join(PUBLIC_BUSINESSES_DIR, item)
-            if os.path.isdir(slug_path):
-                data_file = os.path.join(slug_path, "data.json")
-                if os.path.exists(data_file):
-                    slugs.add(item)
-    return slugs
+    return get_site_index().slugs()
 
 def get_current_count():
     return len(get_already_curated_slugs())
@@ -84,16 +110,14 @@ def print_phone_pitches():
     print("PHONE PITCHES")
     print("=" * 60)
     
-    curated = get_already_curated_slugs()
-    for slug in sorted(curated):
-        pitch_file = os.path.join(PUBLIC_BUSINESSES_DIR, slug, "phone_pitch.txt")
-        if os.path.exists(pitch_file):
-            name = unquote(slug).replace("-", " ").replace("+", " ")
-            print(f"\n--- {name} ---")
-            with open(pitch_file, "r") as f:
+    sites = get_site_index().sites()
+    for slug in sorted(sites):
+        if sites[slug]["has_pitch"]:
+            print(f"\n--- {sites[slug]['name']} ---")
+            with open(os.path.join(PUBLIC_BUSINESSES_DIR, slug, "phone_pitch.txt"), "r") as f:
                 print(f.read())
 
-def commit_and_push_changes():
+def commit_and_push_changes(push=True):
     try:
         import subprocess
         import os
@@ -179,6 +203,10 @@ This is an automated commit generated by the LocWeb curation script."""
         if result.returncode == 0:
             print(f"\nCommitted: {len(new_businesses)} new website(s) - {businesses_list}")
             
+            if not push:
+                print("Skipping push (--no-push)")
+                return
+            
             result = subprocess.run(
                 ["git", "push", "origin", "master"],
                 cwd=repo_dir,
@@ -197,65 +225,202 @@ This is an automated commit generated by the LocWeb curation script."""
         print(f"Git operation failed: {e}")
 
 
-def search_for_businesses(client, keyword, goal):
-    """Phase 1: Search regions until we find enough businesses to meet the goal."""
-    import time
+def search_for_businesses(client, keyword, goal, area_workers=AREA_SCAN_CONCURRENCY, on_found=None, skip_place_ids=(),
+                          areas=None, stop_event=None, budget=None, coverage=None, scheduler=None, scan_log=None):
+    """Phase 1: Search regions concurrently until we find enough businesses to meet the goal."""
     print("\n" + "=" * 60)
     print(f"PHASE 1: Searching for {goal} businesses without websites")
     print("=" * 60)
     
     start_time = time.time()
     curated_slugs = get_already_curated_slugs()
+    if client.place_index:
+        curated_slugs = client.place_index.sync_curated(PUBLIC_BUSINESSES_DIR, curated_slugs)
     businesses_to_process = []
+    # Places in skip_place_ids (jobs resumed from the journal) are never queued again
+    queued_ids = set(skip_place_ids)
+    queued_slugs = set()
     searched_areas = set()
     total_scanned = 0
+    lock = threading.Lock()
+    # The search ends early when the caller's stop_event is set or the run budget runs out
+    cancel_event = stop_event
+    stop_event = threading.Event()
+    search_done = threading.Event()
     
-    while len(businesses_to_process) < goal:
-        remaining = goal - len(businesses_to_process)
-        print(f"\nNeed {remaining} more business(es)...")
-        
-        lat, lng, area_name = get_random_area()
+    def watch_stop():
+        # Leave room for the details requests in-flight pages may still send
+        reserve_calls = client.details_concurrency * area_workers
+        while not search_done.wait(0.5):
+            if cancel_event is not None and cancel_event.is_set():
+                stop_event.set()
+                return
+            reason = budget.exhausted(reserve_calls=reserve_calls) if budget else None
+            if reason:
+                print(f"\n[BUDGET] {reason} - stopping search")
+                stop_event.set()
+                return
+    
+    def queue_business(b):
+        """Claim a found business for this run; returns False if it is a duplicate or over the goal."""
+        if len(businesses_to_process) >= goal:
+            return False
+        place_id = b.get("place_id")
+        if place_id in queued_ids:
+            return False
         
-        if area_name in searched_areas:
-            if len(searched_areas) >= len(US_AREAS):
-                print("Searched all available areas.")
-                break
-            continue
+        slug = sanitize_folder_name(b.get("name", ""))
+        if client.place_index:
+            slug = client.place_index.claim(place_id, b.get("name"), slug, curated_slugs | queued_slugs)
+        elif slug in curated_slugs or slug in queued_slugs:
+            slug = None
+        if not slug:
+            return False
         
-        searched_areas.add(area_name)
-        print(f"\nSearching in {area_name} ({lat:.4f}, {lng:.4f})...")
+        b["slug"] = slug
+        queued_ids.add(place_id)
+        queued_slugs.add(slug)
+        businesses_to_process.append(b)
+        if len(businesses_to_process) >= goal:
+            stop_event.set()
+        return True
+    
+    def scan_cell(area, lat, lng, radius, remaining):
+        """Search one circle, handing each new business to on_found as soon as it qualifies."""
+        nonlocal total_scanned
         
-        try:
-            businesses_found, all_businesses = client.find_businesses_without_website(
-                lat, lng, keyword, target_count=remaining
-            )
-            total_scanned += len(all_businesses)
-        except Exception as e:
-            print(f"  Error searching: {e}")
-            continue
+        scan_stats = {}
+        # Every place looked at goes to the scan archive
+        on_scanned = (lambda b: scan_log.write(b, area["city"])) if scan_log else None
+        new_count = rejected = 0
         
-        if not businesses_found:
-            print(f"  No businesses without websites found")
-            continue
+        def accept(b):
+            # Only businesses this run actually queues count toward the cell's target
+            nonlocal rejected
+            with lock:
+                queued = queue_business(b)
+            if not queued:
+                rejected += 1
+            return queued
         
-        new_businesses = []
-        for b in businesses_found:
-            slug = sanitize_folder_name(b.get("name", ""))
-            if slug not in curated_slugs:
-                already_queued = any(
-                    sanitize_folder_name(queued.get("name", "")) == slug 
-                    for queued in businesses_to_process
-                )
-                if not already_queued:
-                    new_businesses.append(b)
+        businesses = client.iter_businesses_without_website(
+            lat, lng, keyword, target_count=remaining, stop_event=stop_event, radius=radius,
+            scan_stats=scan_stats, on_scanned=on_scanned, accept=accept
+        )
+        with closing(businesses):
+            for b in businesses:
+                new_count += 1
+                print(f"  {area['city']}: queued {b.get('name')}")
+                # Hand each business on as soon as it is queued, not when the search ends
+                if on_found:
+                    on_found(b)
+                if stop_event.is_set():
+                    break
         
-        if new_businesses:
-            print(f"  Found {len(new_businesses)} new business(es):")
-            for b in new_businesses:
-                print(f"    - {b.get('name')}")
-            businesses_to_process.extend(new_businesses[:remaining])
-        else:
-            print(f"  All businesses already curated or queued")
+        with lock:
+            total_scanned += scan_stats["scanned"]
+        if not new_count:
+            if scan_stats["error"]:
+                print(f"  {area['city']}: search failed ({scan_stats['error']})")
+            elif rejected:
+                print(f"  {area['city']}: all businesses already curated or queued")
+            else:
+                print(f"  {area['city']}: no businesses without websites found")
+        return scan_stats, scan_stats["scanned"], new_count
+    
+    def scan_area(area, area_key):
+        """Search up to AREA_CELLS_PER_VISIT cells of the area; returns (results, found, covered, progressed).
+
+        results counts every place the searches returned, including ones skipped as already
+        known, and is None if no cell was searched. progressed is False when the visit
+        queued nothing and left every cell it searched pending.
+        """
+        results = None
+        found = 0
+        progressed = False
+        for _ in range(AREA_CELLS_PER_VISIT if coverage else 1):
+            with lock:
+                remaining = goal - len(businesses_to_process)
+                if remaining <= 0 or stop_event.is_set():
+                    return results, found, False, True
+                searched_areas.add(area["city"])
+            
+            # Without a coverage index the area is searched once, at its center
+            if not coverage:
+                print(f"\nSearching in {area['city']} ({area['lat']:.4f}, {area['lng']:.4f}) for {remaining} more business(es)...")
+                scan_stats, _, found = scan_cell(area, area["lat"], area["lng"], 5000, remaining)
+                return scan_stats["results"], found, True, True
+            
+            cell = coverage.next_cell(area_key, area["lat"], area["lng"])
+            if cell is None:
+                print(f"\n  {area['city']}: fully covered or waiting to retry failed cells, skipping")
+                return results, found, True, True
+            
+            print(f"\nSearching in {area['city']} cell ({cell['lat']:.4f}, {cell['lng']:.4f}) r={cell['radius']}m "
+                  f"depth {cell['depth']} for {remaining} more business(es)...")
+            scan_stats, _, new_count = scan_cell(area, cell["lat"], cell["lng"], cell["radius"], remaining)
+            results = (results or 0) + scan_stats["results"]
+            found += new_count
+            status = coverage.record(area_key, cell, scan_stats["results"], new_count, scan_stats["exhausted"], scan_stats["error"])
+            if status == CELL_SPLIT:
+                print(f"  {area['city']}: cell hit the {NEARBY_RESULT_CAP}-result cap, split into 4")
+            elif status == CELL_ERROR:
+                print(f"  {area['city']}: cell will be retried after a backoff")
+            if status in (CELL_PENDING, CELL_ERROR) and not new_count:
+                # next_cell would hand back the same cell; searching it again now gives the same answer
+                break
+            progressed = True
+        return results, found, False, progressed
+    
+    areas_by_key = {f"{area['city']}|{keyword}": area for area in (areas or US_AREAS)}
+    # Areas being searched right now, and ones with nothing left to search this run
+    busy_keys = set()
+    done_keys = set()
+    # Consecutive visits per area that made no progress (API errors, nothing new queued)
+    stalled_visits = {}
+    
+    def area_worker():
+        while True:
+            with lock:
+                if len(businesses_to_process) >= goal or stop_event.is_set():
+                    return
+                candidates = [key for key in areas_by_key if key not in busy_keys and key not in done_keys]
+                # The scheduler favors areas with a good past yield; without one, pick at random
+                area_key = scheduler.pick(candidates) if scheduler else (random.choice(candidates) if candidates else None)
+                if area_key is None:
+                    return
+                busy_keys.add(area_key)
+            
+            try:
+                results, found, covered, progressed = scan_area(areas_by_key[area_key], area_key)
+                # Visits that only met known places still count, so a spent area's yield falls
+                if scheduler and results is not None:
+                    scheduler.record(area_key, results, found)
+            except Exception as e:
+                print(f"  Error searching {areas_by_key[area_key]['city']}: {e}")
+                covered, progressed = False, False
+            
+            with lock:
+                busy_keys.discard(area_key)
+                stalled_visits[area_key] = 0 if progressed else stalled_visits.get(area_key, 0) + 1
+                if stalled_visits[area_key] >= AREA_MAX_STALLED_VISITS and not covered:
+                    print(f"  {areas_by_key[area_key]['city']}: no progress in {AREA_MAX_STALLED_VISITS} visits, giving up on it this run")
+                    covered = True
+                if covered:
+                    done_keys.add(area_key)
+    
+    if budget or cancel_event is not None:
+        threading.Thread(target=watch_stop, daemon=True).start()
+    
+    workers = [threading.Thread(target=area_worker, daemon=True) for _ in range(max(1, area_workers))]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    search_done.set()
+    
+    if len(businesses_to_process) < goal and not stop_event.is_set():
+        print("Searched all available areas.")
     
     elapsed_time = time.time() - start_time
     regions_searched = len(searched_areas)
@@ -267,88 +432,447 @@ def search_for_businesses(client, keyword, goal):
     print(f"  Total scanned: {total_scanned}")
     print(f"  Regions searched: {regions_searched}")
     print(f"  Time elapsed: {elapsed_time:.1f}s")
+    print(f"  API calls: {client.api_calls}")
+    for line in get_rate_limiter().summary_lines():
+        print(f"  {line}")
+    print(f"  Page token delay: {client.page_token_delay:.2f}s")
+    if coverage:
+        cells = coverage.stats()
+        print(f"  Coverage cells: {', '.join(f'{n} {status}' for status, n in sorted(cells.items()))}")
+    if client.cache:
+        for endpoint, (hits, misses) in client.cache.stats().items():
+            print(f"  Cache {endpoint}: {hits} hits, {misses} misses")
     print(f"{'=' * 60}\n")
     
     return businesses_to_process
 
 
-def process_single_business(business):
+def download_business_photos(business):
+    name = business.get("name", "Unknown")
+    photo_urls = business.get("photo_urls", [])
+    if not photo_urls:
+        return []
+    
+    slug = business.get("slug") or sanitize_folder_name(name)
+    local_paths = download_photos_locally(photo_urls, slug)
+    print(f"[AGENT] {name}: Downloaded {len(local_paths)} photos")
+    optimize_business_photos(os.path.join(PUBLIC_BUSINESSES_DIR, slug), local_paths)
+    return local_paths
+
+
+def process_single_business(business, mode=None):
     """Process a single business: download photos and generate website."""
     name = business.get("name", "Unknown")
     print(f"\n[AGENT] Starting: {name}")
     
-    photo_urls = business.get("photo_urls", [])
-    if photo_urls:
-        local_paths = download_photos_locally(photo_urls, name)
-        print(f"[AGENT] {name}: Downloaded {len(local_paths)} photos")
-    else:
-        local_paths = []
+    local_paths = business.get("local_photos")
+    if local_paths is None:
+        local_paths = download_business_photos(business)
     
-    slug = generate_website_for_business(business, photo_paths=local_paths, use_opencode=True)
+    slug, fallback = generate_website_for_business(business, photo_paths=local_paths, use_opencode=True, mode=mode)
     
-    if slug:
+    if slug and fallback:
+        print(f"[AGENT] ✓ Completed from template after agent failure ({fallback}): {name}")
+    elif slug:
         print(f"[AGENT] ✓ Completed: {name}")
     else:
         print(f"[AGENT] ✗ Failed: {name}")
     
-    return slug
+    return slug, fallback
 
 
-def process_businesses_parallel(businesses, parallel_workers):
+def process_businesses_parallel(businesses, parallel_workers, total=None, stats=None, on_done=None, controller=None, on_start=None,
+                                budget=None, mode=None):
     """Phase 2: Process businesses with parallel agents, keeping pool full."""
+    # With an AIMDController the number of agents in flight follows controller.limit
+    if controller is None:
+        controller = AIMDController(parallel_workers, parallel_workers, parallel_workers)
+    
     print("\n" + "=" * 60)
-    print(f"PHASE 2: Generating websites ({parallel_workers} parallel agents)")
+    print(f"PHASE 2: Generating websites ({controller.limit} parallel agents, {controller.min_limit}-{controller.max_limit} adaptive)")
     print("=" * 60)
     
-    total = len(businesses)
+    if total is None:
+        total = len(businesses)
+    # A queue is fed by Phase 1 while it runs and ends with None; anything else is loaded into one
+    if not isinstance(businesses, queue.Queue):
+        business_queue = queue.Queue()
+        for business in businesses:
+            business_queue.put(business)
+        business_queue.put(None)
+    else:
+        business_queue = businesses
     completed = 0
     success_count = 0
     
-    with ThreadPoolExecutor(max_workers=parallel_workers) as executor:
+    with ThreadPoolExecutor(max_workers=controller.max_limit) as executor:
         futures = {}
-        business_queue = list(businesses)
+        started_at = {}
+        exhausted = False
         
-        initial_batch = min(parallel_workers, len(business_queue))
-        for _ in range(initial_batch):
-            business = business_queue.pop(0)
-            future = executor.submit(process_single_business, business)
-            futures[future] = business
+        def budget_reason():
+            # Stop starting agents once a typical session would overrun the deadline, or a
+            # business's photos would cross the API call limit; running ones are drained
+            return budget.exhausted(reserve_seconds=controller.smoothed_latency or 0, reserve_calls=MAX_PHOTOS) if budget else None
         
-        while futures:
-            done_futures = []
-            for future in as_completed(futures):
-                done_futures.append(future)
-                break
+        def fill_pool(block=False):
+            """Start agents while there is room; only waits for a business if block is set."""
+            nonlocal exhausted
+            while not exhausted and len(futures) < controller.limit:
+                reason = budget_reason()
+                if not reason:
+                    try:
+                        business = business_queue.get(block=block)
+                    except queue.Empty:
+                        return
+                    block = False
+                    if business is None:
+                        exhausted = True
+                        return
+                    # Waiting for the business may have used up the rest of the budget
+                    reason = budget_reason()
+                if reason:
+                    print(f"\n[BUDGET] {reason} - not starting new agents, draining {len(futures)} in flight")
+                    exhausted = True
+                    return
+                if on_start:
+                    on_start(business)
+                future = executor.submit(process_single_business, business, mode)
+                futures[future] = business
+                started_at[future] = time.time()
+        
+        fill_pool()
+        
+        while futures or not exhausted:
+            if not futures:
+                # Nothing to report on, so it is safe to wait for the next business
+                fill_pool(block=True)
+                continue
+            
+            # While there is room for another agent, come back regularly to check the queue
+            has_room = not exhausted and len(futures) < controller.limit
+            done_futures, _ = wait(futures, timeout=POOL_POLL_INTERVAL if has_room else None, return_when=FIRST_COMPLETED)
             
             for future in done_futures:
                 business = futures.pop(future)
+                start = started_at.pop(future)
+                elapsed = time.time() - start
                 completed += 1
                 
+                slug, fallback = None, None
                 try:
-                    slug = future.result()
+                    slug, fallback = future.result()
                     if slug:
                         success_count += 1
                 except Exception as e:
                     print(f"[ERROR] {business.get('name')}: {e}")
                 
-                print(f"\n[PROGRESS] {completed}/{total} completed, {success_count} successful")
+                # A site the template built after the agent failed still counts as a failure here
+                controller.record(elapsed, bool(slug) and not fallback, timed_out=elapsed >= OPENCODE_SESSION_TIMEOUT, started_at=start)
+                
+                # slug is None on failure; fallback is the agent's failure reason if the template built the site
+                if on_done:
+                    on_done(business, slug, fallback)
                 
-                if business_queue:
-                    next_business = business_queue.pop(0)
-                    new_future = executor.submit(process_single_business, next_business)
-                    futures[new_future] = next_business
+                progress = f"{completed}/{total} completed, {success_count} successful"
+                if stats:
+                    progress += ", " + ", ".join(f"{v} {k}" for k, v in stats.items())
+                progress += f", agents {len(futures)}/{controller.limit}"
+                print(f"\n[PROGRESS] {progress}")
+            
+            fill_pool()
     
     return success_count
 
 
+def load_resumable_jobs(journal):
+    """Return businesses from the journal that still need work, cleaning up ones that gave up.
+
+    Jobs that failed MAX_ATTEMPTS times are dropped, along with their half-built folder.
+    A folder still holding BUILD_MARKER never finished generating.
+    """
+    jobs = journal.load()
+    pending = []
+    for place_id, job in list(jobs.items()):
+        if job["state"] == STATE_DONE or not job.get("business"):
+            continue
+        
+        if job["state"] == STATE_FAILED and job["attempts"] >= MAX_ATTEMPTS:
+            slug = job.get("slug")
+            folder = os.path.join(PUBLIC_BUSINESSES_DIR, slug) if slug else None
+            if folder and os.path.exists(os.path.join(folder, BUILD_MARKER)):
+                shutil.rmtree(folder, ignore_errors=True)
+                get_site_index().remove(slug)
+                print(f"  Removed partial folder for {slug} after {job['attempts']} attempts")
+            del jobs[place_id]
+            continue
+        
+        business = Business.from_places(job["business"])
+        if job["state"] == STATE_DISCOVERED:
+            business.local_photos = None
+        pending.append(business)
+    
+    journal.compact(jobs)
+    return pending
+
+
+def put_until_stopped(target_queue, item, stop_event):
+    """Put item on a bounded queue, giving up if stop_event is set while it is full."""
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_pipeline(client, keyword, goal, parallel_workers, max_workers=None, journal=None, resumed=(),
+                 areas=None, budget=None, coverage=None, scheduler=None, scan_log=None, mode=None):
+    """Stream businesses from Phase 1 through photo download into website generation.
+
+    Bounded queues between the stages apply backpressure, so discovery never runs far
+    ahead of the generator agents. Businesses in resumed go through the pipeline first and
+    count toward the goal; every state change is written to the journal if one is given.
+    When generation stops (done or out of budget) the upstream stages are told to stop too.
+    """
+    queue_size = max(2, max_workers or parallel_workers)
+    found_queue = queue.Queue(maxsize=queue_size)
+    ready_queue = queue.Queue(maxsize=queue_size)
+    stats = {"found": 0, "photos ready": 0}
+    stats_lock = threading.Lock()
+    stop_event = threading.Event()
+    
+    def record(business, state, reason=None):
+        if journal:
+            journal.record(business, state, reason)
+    
+    def on_found(business):
+        with stats_lock:
+            stats["found"] += 1
+        record(business, STATE_DISCOVERED)
+        put_until_stopped(found_queue, business, stop_event)
+    
+    def discover():
+        try:
+            for business in resumed:
+                with stats_lock:
+                    stats["found"] += 1
+                put_until_stopped(found_queue, business, stop_event)
+            
+            remaining = goal - len(resumed)
+            if remaining > 0:
+                search_for_businesses(
+                    client, keyword, remaining, on_found=on_found,
+                    skip_place_ids={b.get("place_id") for b in resumed},
+                    areas=areas, stop_event=stop_event, budget=budget, coverage=coverage,
+                    scheduler=scheduler, scan_log=scan_log
+                )
+        except Exception as e:
+            print(f"[ERROR] Search failed: {e}")
+        finally:
+            put_until_stopped(found_queue, None, stop_event)
+    
+    def fetch_photos():
+        while True:
+            business = found_queue.get()
+            if business is None:
+                put_until_stopped(ready_queue, None, stop_event)
+                return
+            if business.get("local_photos") is None:
+                if budget and budget.calls_exhausted(reserve_calls=MAX_PHOTOS):
+                    print("[BUDGET] API call budget reached - not downloading more photos")
+                    put_until_stopped(ready_queue, None, stop_event)
+                    return
+                try:
+                    business["local_photos"] = download_business_photos(business)
+                    record(business, STATE_PHOTOS)
+                except Exception as e:
+                    print(f"[ERROR] Photos for {business.get('name')}: {e}")
+            stats["photos ready"] += 1
+            put_until_stopped(ready_queue, business, stop_event)
+    
+    def on_start(business):
+        record(business, STATE_GENERATING)
+    
+    def on_done(business, slug, fallback=None):
+        if slug:
+            record(business, STATE_DONE, f"agent failed ({fallback}), rendered from template" if fallback else None)
+            if client.place_index:
+                client.place_index.mark_curated(business.get("place_id"), slug)
+        else:
+            record(business, STATE_FAILED, "website generation failed")
+    
+    threading.Thread(target=discover, daemon=True).start()
+    threading.Thread(target=fetch_photos, daemon=True).start()
+    
+    controller = AIMDController(parallel_workers, MIN_PARALLEL_AGENTS, max_workers or parallel_workers)
+    success_count = process_businesses_parallel(
+        ready_queue, parallel_workers, total=max(goal, len(resumed)), stats=stats,
+        on_done=on_done, controller=controller, on_start=on_start, budget=budget, mode=mode
+    )
+    stop_event.set()
+    return success_count, stats["found"]
+
+
+def refresh_curated_businesses(client, parallel_workers, max_workers=None, mode=None, budget=None):
+    """Re-fetch details for every curated business and redo only the parts that changed.
+
+    Businesses whose content fingerprint (the fields the prompt is built from) and photo
+    fingerprint both match data.json are skipped. Changed photos are downloaded again;
+    the site is regenerated only if the content changed or the number of photos did.
+    Checking stops once the budget could not cover another lookup and its photos.
+    Returns (refreshed, checked).
+    """
+    print("\n" + "=" * 60)
+    print("REFRESH: Checking curated businesses for changed Google data")
+    print("=" * 60)
+    
+    curated = []
+    for slug in sorted(get_already_curated_slugs()):
+        try:
+            data = Business.load(os.path.join(PUBLIC_BUSINESSES_DIR, slug))
+        except (OSError, ValueError) as e:
+            print(f"  {slug}: unreadable data.json ({e})")
+            continue
+        if data.place_id:
+            curated.append((slug, data))
+    
+    unchanged = 0
+    photos_only = 0
+    to_regenerate = []
+    place_ids = [data.place_id for _, data in curated]
+    with closing(client.iter_place_details(place_ids, refresh=True)) as details_iter:
+        for (slug, old), fresh in zip(curated, details_iter):
+            reason = budget.exhausted(reserve_calls=1 + MAX_PHOTOS) if budget else None
+            if reason:
+                print(f"  [BUDGET] {reason} - not checking the remaining businesses")
+                break
+            if not fresh.get("place_id"):
+                print(f"  {slug}: details lookup failed, keeping the current site")
+                continue
+            if fresh.get("website"):
+                print(f"  {slug}: now has its own website, leaving the demo as is")
+                continue
+            
+            fresh = Business.from_places(fresh)
+            fresh.slug = slug
+            old_fingerprints = old.get("fingerprints") or business_fingerprints(old)
+            new_fingerprints = business_fingerprints(fresh)
+            if new_fingerprints == old_fingerprints:
+                unchanged += 1
+                continue
+            
+            old_photos = old.local_photos or []
+            if new_fingerprints["photos"] != old_fingerprints["photos"]:
+                print(f"  {slug}: photos changed, downloading again")
+                fresh["local_photos"] = download_business_photos(fresh)
+            else:
+                fresh["local_photos"] = old_photos
+            
+            if new_fingerprints["content"] != old_fingerprints["content"] or len(fresh["local_photos"]) != len(old_photos):
+                print(f"  {slug}: business data changed, regenerating")
+                to_regenerate.append(fresh)
+            else:
+                # Same photo slots, so the existing page still points at the right files
+                write_business_data(fresh, os.path.join(PUBLIC_BUSINESSES_DIR, slug))
+                photos_only += 1
+    
+    print(f"\n  Checked: {len(curated)}, unchanged: {unchanged}, photos only: {photos_only}, to regenerate: {len(to_regenerate)}")
+    
+    regenerated = 0
+    if to_regenerate:
+        controller = AIMDController(parallel_workers, MIN_PARALLEL_AGENTS, max_workers or parallel_workers)
+        regenerated = process_businesses_parallel(to_regenerate, parallel_workers, controller=controller, budget=budget, mode=mode)
+    return regenerated + photos_only, len(curated)
+
+
+def connection_pool_size(client, max_workers, area_workers=AREA_SCAN_CONCURRENCY):
+    """Peak concurrent requests to the Places host, so urllib3 never drops a kept-alive connection.
+
+    Each area worker runs its details lookups plus a prefetched page; photo downloads
+    run alongside. Agents talk to the OpenCode server, which gets its own pool.
+    """
+    per_area = client.details_concurrency + (1 if client.page_prefetch else 0)
+    return max(max_workers, max(1, area_workers) * per_area + PHOTO_DOWNLOAD_CONCURRENCY)
+
+
+def parse_duration(value):
+    """Parse a duration such as 90m, 2h, 600s or a plain number of seconds."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    try:
+        if value[-1:].lower() in units:
+            return float(value[:-1]) * units[value[-1].lower()]
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid duration: {value!r} (use e.g. 90m, 2h, 600s)")
+
+
+def load_areas(path):
+    """Load a JSON list of {"city", "lat", "lng"} areas to search instead of US_AREAS."""
+    with open(path, "r", encoding="utf-8") as f:
+        areas = json.load(f)
+    return [
+        {"city": a["city"], "lat": float(a["lat"]), "lng": float(a["lng"])}
+        for a in areas
+    ]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="LocWeb - Local Business Website Generator")
+    parser.add_argument("--goal", type=int,
+                        help="number of websites to generate (default 6)")
+    parser.add_argument("--parallel", type=int,
+                        help="starting number of parallel agents (default 3)")
+    parser.add_argument("--keyword",
+                        help="search keyword passed to Nearby Search")
+    parser.add_argument("--areas-file",
+                        help='JSON list of {"city", "lat", "lng"} areas to search instead of the built-in list')
+    parser.add_argument("--yes", "-y", action="store_true",
+                        help="never prompt; use defaults for anything not given on the command line")
+    parser.add_argument("--no-push", action="store_true",
+                        help="commit generated websites but do not push them")
+    parser.add_argument("--deadline", type=parse_duration,
+                        help="wall-clock budget for the run, e.g. 90m or 2h; in-flight agents are drained")
+    parser.add_argument("--max-api-calls", type=int,
+                        help="stop starting new work before this many billed Places requests (photos included) have been sent")
+    parser.add_argument("--mode", choices=["agent", "template"], default=WEBSITE_MODE,
+                        help="generate each site with an OpenCode agent or render the built-in template (default: %(default)s)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="re-check curated businesses and regenerate only those whose Google data changed")
+    parser.add_argument("--resume", action="store_true",
+                        help="finish unfinished jobs from the last run before searching for new businesses")
+    return parser.parse_args()
+
+
+def ask_int(value, prompt, default, invalid_message, assume_yes):
+    if value is not None:
+        return max(1, value)
+    if assume_yes:
+        return default
+    
+    raw = input(prompt).strip()
+    if not raw:
+        return default
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        print(invalid_message)
+        return default
+
+
 def main():
+    args = parse_args()
     api_key = os.environ.get("GOOGLE_MAPS_API_KEY")
     
     if not api_key:
         print("Error: GOOGLE_MAPS_API_KEY not found in .env file")
         return
     
-    client = GoogleMapsClient(api_key)
+    client = GoogleMapsClient(api_key, cache=PlacesCache(), place_index=PlaceIndex())
+    # Counts every billed request, photo downloads included, not just client.api_calls
+    budget = RunBudget(args.deadline, args.max_api_calls, get_rate_limiter().total_requests)
+    areas = load_areas(args.areas_file) if args.areas_file else None
     
     print("LocWeb - Local Business Website Generator")
     print("-" * 50)
@@ -356,63 +880,78 @@ def main():
     current_count = get_current_count()
     print(f"Currently have {current_count} websites generated.\n")
     
-    goal_input = input("Goal (number of websites to generate, default 6): ").strip()
-    parallel_input = input("Number of parallel agents (default 3): ").strip()
-    keyword = input("Search keyword (optional): ").strip() or ""
+    if args.refresh:
+        parallel_workers = ask_int(args.parallel, "Number of parallel agents (default 3): ", 3,
+                                   "Invalid number, using default of 3 parallel agents.", args.yes)
+        max_workers = max(parallel_workers, MAX_PARALLEL_AGENTS or parallel_workers * 2)
+        configure_pool_size(connection_pool_size(client, max_workers, area_workers=1))
+        refreshed, checked = refresh_curated_businesses(client, parallel_workers, max_workers, mode=args.mode, budget=budget)
+        
+        print("\n" + "=" * 60)
+        print(f"REFRESH COMPLETE: Updated {refreshed}/{checked} websites")
+        print(f"  API calls: {client.api_calls}")
+        for line in get_rate_limiter().summary_lines():
+            print(f"  {line}")
+        print("=" * 60)
+        if refreshed:
+            commit_and_push_changes(push=not args.no_push)
+        return
     
-    if goal_input:
-        try:
-            goal = max(1, int(goal_input))
-        except ValueError:
-            print("Invalid number, using default of 6.")
-            goal = 6
-    else:
-        goal = 6
+    journal = JobJournal()
+    resumed = []
+    if args.resume:
+        resumed = load_resumable_jobs(journal)
+        print(f"Resuming {len(resumed)} unfinished job(s) from the journal.\n")
     
-    if parallel_input:
-        try:
-            parallel_workers = max(1, int(parallel_input))
-        except ValueError:
-            print("Invalid number, using default of 3 parallel agents.")
-            parallel_workers = 3
-    else:
-        parallel_workers = 3
+    goal = ask_int(args.goal, "Goal (number of websites to generate, default 6): ", 6,
+                   "Invalid number, using default of 6.", args.yes)
+    parallel_workers = ask_int(args.parallel, "Number of parallel agents (default 3): ", 3,
+                               "Invalid number, using default of 3 parallel agents.", args.yes)
+    keyword = args.keyword
+    if keyword is None:
+        keyword = "" if args.yes else input("Search keyword (optional): ").strip()
+    
+    max_workers = max(parallel_workers, MAX_PARALLEL_AGENTS or parallel_workers * 2)
+    configure_pool_size(connection_pool_size(client, max_workers))
     
     print(f"\nConfiguration:")
     print(f"  Goal: {goal} websites")
-    print(f"  Parallel agents: {parallel_workers}")
+    print(f"  Parallel agents: {parallel_workers} (adaptive {MIN_PARALLEL_AGENTS}-{max_workers})")
     print(f"  Keyword: {keyword or '(none)'}")
+    print(f"  Mode: {args.mode}")
+    print(f"  Areas: {len(areas) if areas else len(US_AREAS)}{' from ' + args.areas_file if areas else ''}")
+    if args.deadline:
+        print(f"  Deadline: {args.deadline / 60:.1f} min")
+    if args.max_api_calls:
+        print(f"  Max API calls: {args.max_api_calls}")
+    if resumed:
+        print(f"  Resumed jobs: {len(resumed)}")
     
-    response = input("\nProceed? (y/n): ").strip().lower()
-    if response != "y" and response != "yes":
-        print("Cancelled.")
-        return
+    if not args.yes:
+        response = input("\nProceed? (y/n): ").strip().lower()
+        if response != "y" and response != "yes":
+            print("Cancelled.")
+            return
     
-    businesses = search_for_businesses(client, keyword, goal)
+    success_count, found_count = run_pipeline(
+        client, keyword, goal, parallel_workers, max_workers, journal=journal, resumed=resumed,
+        areas=areas, budget=budget, coverage=CoverageIndex(), scheduler=AreaScheduler(),
+        scan_log=ScanLog(), mode=args.mode
+    )
     
-    if not businesses:
+    if not found_count:
         print("\nNo businesses found to process.")
         return
     
-    print(f"\n{'=' * 60}")
-    print(f"Ready to generate {len(businesses)} website(s)")
-    print(f"{'=' * 60}")
-    for i, b in enumerate(businesses, 1):
-        print(f"  {i}. {b.get('name')}")
-    
-    response = input("\nStart website generation? (y/n): ").strip().lower()
-    if response != "y" and response != "yes":
-        print("Cancelled.")
-        return
-    
-    success_count = process_businesses_parallel(businesses, parallel_workers)
-    
     print("\n" + "=" * 60)
-    print(f"COMPLETE: Generated {success_count}/{len(businesses)} websites")
+    print(f"COMPLETE: Generated {success_count}/{found_count} websites")
+    print(f"  API calls: {client.api_calls}")
+    for line in get_rate_limiter().summary_lines():
+        print(f"  {line}")
     print("=" * 60)
     
     print_phone_pitches()
-    commit_and_push_changes()
+    commit_and_push_changes(push=not args.no_push)
     
     print("\nDone!")
 
@@ -1,9 +1,16 @@
-import requests
 import time
 import random
 import os
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+from business import Business
+from http_session import get_session, backoff_delay, HTTP_MAX_RETRIES
+from place_index import STATUS_CURATED
+from photo_store import get_photo_store, link_into, PHOTO_DOWNLOAD_CONCURRENCY
+from rate_limiter import get_rate_limiter
 
 load_dotenv()
 
@@ -16,6 +23,26 @@ PUBLIC_BUSINESSES_DIR = os.path.join(
 DEFAULT_LAT = 42.312
 DEFAULT_LNG = -71.213
 
+PLACES_API_BASE = "https://maps.googleapis.com/maps/api/place"
+
+# Max number of place-details requests in flight for a single results page
+DETAILS_CONCURRENCY = int(os.environ.get("PLACES_DETAILS_CONCURRENCY", "8"))
+
+# next_page_token activation: starting estimate, poll interval bounds and give-up time (seconds)
+PAGE_TOKEN_INITIAL_DELAY = 2.0
+PAGE_TOKEN_MIN_POLL = 0.2
+PAGE_TOKEN_MAX_POLL = 2.0
+PAGE_TOKEN_TIMEOUT = 15.0
+
+# Request the next results page while details for the current one are being fetched
+PAGE_PREFETCH = os.environ.get("PLACES_PAGE_PREFETCH", "1") != "0"
+
+# Minimal field mask used to decide whether a place is worth a full details lookup
+PROBE_FIELDS = "place_id,website,business_status"
+# Photos fetched per business; each one is a billed Places photo request
+MAX_PHOTOS = 5
+DETAILS_FIELDS = "name,place_id,vicinity,formatted_address,formatted_phone_number,international_phone_number,rating,user_ratings_total,price_level,opening_hours,website,reviews,photos,geometry,url,utc_offset,icon,icon_mask_base_uri,icon_background_color,reference,types,business_status,curbside_pickup,delivery,dine_in,takeout,reservable"
+
 def sanitize_folder_name(name):
     return "".join(c if c.isalnum or c in " -_" else "_" for c in name).strip()[:50]
 
@@ -24,42 +51,75 @@ def download_photos_locally(photo_urls, business_name):
     photos_dir = os.path.join(PUBLIC_BUSINESSES_DIR, slug, "photos")
     os.makedirs(photos_dir, exist_ok=True)
 
-    local_paths = []
-    for i, url in enumerate(photo_urls[:5]):
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                ext = ".jpg"
-                if response.headers.get("content-type", "").startswith("image/"):
-                    content_type = response.headers["content-type"]
-                    if "png" in content_type:
-                        ext = ".png"
-                    elif "webp" in content_type:
-                        ext = ".webp"
-
-                filename = f"photo-{i + 1}{ext}"
-                filepath = os.path.join(photos_dir, filename)
+    store = get_photo_store()
+    urls = photo_urls[:MAX_PHOTOS]
+    if not urls:
+        return []
 
-                with open(filepath, "wb") as f:
-                    f.write(response.content)
+    local_paths = []
+    with ThreadPoolExecutor(max_workers=min(PHOTO_DOWNLOAD_CONCURRENCY, len(urls))) as executor:
+        futures = [executor.submit(store.fetch, url) for url in urls]
+        for i, future in enumerate(futures):
+            try:
+                blob_path, cached = future.result()
+                filename = f"photo-{i + 1}{os.path.splitext(blob_path)[1]}"
+                link_into(blob_path, os.path.join(photos_dir, filename))
 
                 local_path = f"photos/{filename}"
                 local_paths.append(local_path)
-                print(f"    Downloaded photo {i+1}: {local_path}")
-            else:
-                print(f"    Failed to download photo {i+1}: HTTP {response.status_code}")
-        except Exception as e:
-            print(f"    Error downloading photo {i+1}: {e}")
+                print(f"    {'Reused' if cached else 'Downloaded'} photo {i+1}: {local_path}")
+            except IOError as e:
+                print(f"    Failed to download photo {i+1}: {e}")
+            except Exception as e:
+                print(f"    Error downloading photo {i+1}: {e}")
 
     return local_paths
 
+def _pause(seconds, stop_event=None):
+    """Sleep for seconds; returns True early if stop_event gets set."""
+    if stop_event is not None:
+        return stop_event.wait(seconds)
+    time.sleep(seconds)
+    return False
+
 class GoogleMapsClient:
-    def __init__(self, api_key):
+    def __init__(self, api_key, details_concurrency=DETAILS_CONCURRENCY, cache=None, page_prefetch=PAGE_PREFETCH, place_index=None):
         self.api_key = api_key
+        self.details_concurrency = max(1, int(details_concurrency))
+        self.cache = cache
+        self.place_index = place_index
+        self.page_prefetch = page_prefetch
+        # Smoothed observed time between receiving a next_page_token and it becoming valid
+        self.page_token_delay = PAGE_TOKEN_INITIAL_DELAY
+        self._token_lock = threading.Lock()
+        # Places API requests actually sent (cache hits excluded)
+        self.api_calls = 0
+        self._calls_lock = threading.Lock()
     
-    def get_nearby_businesses(self, lat, lng, radius=5000, keyword=None, page_token=None):
-        base_url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    def _get_json(self, endpoint, params, sku=None, refresh=False):
+        if self.cache and not refresh:
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                cached["from_cache"] = True
+                return cached
         
+        url = f"{PLACES_API_BASE}/{endpoint}/json"
+        limiter = get_rate_limiter()
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            limiter.acquire(endpoint, sku)
+            with self._calls_lock:
+                self.api_calls += 1
+            data = get_session().get(url, params=params).json()
+            if data.get("status") != "OVER_QUERY_LIMIT" or attempt == HTTP_MAX_RETRIES:
+                break
+            # Hold back every thread on this endpoint, not just the one that hit the limit
+            limiter.drain(endpoint, backoff_delay(attempt))
+        
+        if self.cache:
+            self.cache.put(endpoint, params, data)
+        return data
+    
+    def get_nearby_businesses(self, lat, lng, radius=5000, keyword=None, page_token=None, refresh=False):
         params = {
             "location": f"{lat},{lng}",
             "radius": radius,
@@ -73,25 +133,97 @@ class GoogleMapsClient:
         if page_token:
             params["pagetoken"] = page_token
         
-        response = requests.get(base_url, params=params)
-        return response.json()
+        return self._get_json("nearbysearch", params, refresh=refresh)
     
-    def get_place_details(self, place_id):
-        base_url = "https://maps.googleapis.com/maps/api/place/details/json"
+    def fetch_next_page(self, lat, lng, keyword, page_token, issued_at, stop_event=None, radius=5000, cached=False):
+        """Poll with growing intervals until page_token is accepted.
+
+        Returns the page data (or the last error response), or None if stop_event was set.
+        A token from a cached first page expired long ago, so with cached the first page
+        is requested again for a live token instead of polling the dead one.
+        """
+        if cached:
+            first = self.get_nearby_businesses(lat, lng, radius=radius, keyword=keyword, refresh=True)
+            if first.get("status") != "OK":
+                return first
+            page_token = first.get("next_page_token")
+            if not page_token:
+                # The results shrank to one page since they were cached
+                return {"status": "ZERO_RESULTS", "results": []}
+            issued_at = time.time()
+        
+        with self._token_lock:
+            delay = max(0, issued_at + self.page_token_delay * 0.75 - time.time())
+        interval = PAGE_TOKEN_MIN_POLL
         
+        while True:
+            if _pause(delay, stop_event):
+                return None
+            
+            data = self.get_nearby_businesses(lat, lng, radius=radius, keyword=keyword, page_token=page_token)
+            elapsed = time.time() - issued_at
+            if data.get("status") != "INVALID_REQUEST" or elapsed > PAGE_TOKEN_TIMEOUT:
+                break
+            
+            delay = interval
+            interval = min(interval * 1.5, PAGE_TOKEN_MAX_POLL)
+        
+        if data.get("status") == "OK":
+            with self._token_lock:
+                self.page_token_delay = 0.7 * self.page_token_delay + 0.3 * elapsed
+        return data
+    
+    def iter_nearby_pages(self, lat, lng, keyword=None, max_pages=20, stop_event=None, radius=5000):
+        """Yield successive nearby-search pages until results run out or max_pages is hit.
+
+        With page_prefetch enabled the next page is already being requested while the
+        caller works on the current one. Pages served from the cache are not prefetched:
+        their token is dead, and getting a live one costs a fresh first-page request that
+        is only worth paying if the caller asks for the next page.
+        """
+        prefetcher = ThreadPoolExecutor(max_workers=1) if self.page_prefetch else None
+        try:
+            data = self.get_nearby_businesses(lat, lng, radius=radius, keyword=keyword)
+            for page_num in range(1, max_pages + 1):
+                issued_at = time.time()
+                page_token = data.get("next_page_token") if data.get("status") == "OK" else None
+                cached = bool(data.get("from_cache"))
+                if page_num == max_pages:
+                    page_token = None
+                
+                next_page = None
+                if page_token and prefetcher and not cached:
+                    next_page = prefetcher.submit(
+                        self.fetch_next_page, lat, lng, keyword, page_token, issued_at, stop_event, radius, cached
+                    )
+                
+                yield data
+                
+                if not page_token:
+                    return
+                if next_page:
+                    data = next_page.result()
+                else:
+                    data = self.fetch_next_page(lat, lng, keyword, page_token, issued_at, stop_event, radius, cached)
+                if data is None:
+                    return
+        finally:
+            if prefetcher:
+                prefetcher.shutdown(wait=False, cancel_futures=True)
+    
+    def get_place_details(self, place_id, fields=DETAILS_FIELDS, refresh=False):
         params = {
             "place_id": place_id,
-            "fields": "name,place_id,vicinity,formatted_address,formatted_phone_number,international_phone_number,rating,user_ratings_total,price_level,opening_hours,website,reviews,photos,geometry,url,utc_offset,icon,icon_mask_base_uri,icon_background_color,reference,types,business_status,curbside_pickup,delivery,dine_in,takeout,reservable",
+            "fields": fields,
             "key": self.api_key
         }
         
-        response = requests.get(base_url, params=params)
-        json_data = response.json()
+        json_data = self._get_json("details", params, sku="details_probe" if fields == PROBE_FIELDS else "details", refresh=refresh)
         result = json_data.get("result", {})
         
         if "photos" in result and isinstance(result["photos"], list):
             photo_urls = []
-            for photo in result["photos"][:5]:
+            for photo in result["photos"][:MAX_PHOTOS]:
                 photo_ref = photo.get("photo_reference")
                 if photo_ref:
                     photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photo_reference={photo_ref}&key={self.api_key}"
@@ -100,98 +232,241 @@ class GoogleMapsClient:
         
         return result
     
-    def find_businesses_without_website(self, lat, lng, keyword="", target_count=5):
+    def needs_website(self, probe):
+        return not probe.get("website") and probe.get("business_status") != "CLOSED_PERMANENTLY"
+    
+    def iter_place_details(self, place_ids, fields=DETAILS_FIELDS, refresh=False, on_unused=None):
+        """Fetch details for place_ids concurrently, yielding results in input order.
+
+        Closing the generator early cancels any requests that have not started yet. The
+        ones already running are billed anyway, so with on_unused they are waited for and
+        passed to on_unused(place_id, result) instead of being dropped.
+        With refresh the response cache is bypassed (and then updated).
+        """
+        if not place_ids:
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.details_concurrency, len(place_ids)))
+        futures = []
+        delivered = 0
+        try:
+            futures = [executor.submit(self.get_place_details, place_id, fields, refresh) for place_id in place_ids]
+            for future in futures:
+                result = future.result()
+                delivered += 1
+                yield result
+        finally:
+            for future in futures[delivered:]:
+                future.cancel()
+            if on_unused:
+                for place_id, future in zip(place_ids[delivered:], futures[delivered:]):
+                    if not future.cancelled() and future.exception() is None:
+                        on_unused(place_id, future.result())
+            executor.shutdown(wait=False)
+    
+    def iter_businesses_without_website(self, lat, lng, keyword="", target_count=5, stop_event=None, radius=5000,
+                                        scan_stats=None, on_scanned=None, accept=None):
+        """Page through a nearby search, yielding each place without a website as soon as it qualifies.
+
+        Stops after target_count places. If accept is given, a place only counts toward
+        target_count, and is only yielded, when accept(business) returns True. Every place
+        looked at (probe or full details) is passed to on_scanned instead of being kept in
+        memory. If scan_stats is a dict it receives "results" (places returned), "scanned",
+        "exhausted" (True when the search reached the end of its results) and "error" (the
+        status of a page that failed, else None).
+        """
         print(f"\nSearching for {target_count} businesses without websites...")
         
-        found_without_website = []
-        all_businesses = []
-        page_token = None
+        if scan_stats is None:
+            scan_stats = {}
+        scan_stats.update(results=0, scanned=0, exhausted=False, error=None)
+        found_count = 0
         page_num = 0
         max_pages = 20
         
-        while len(found_without_website) < target_count and page_num < max_pages:
-            page_num += 1
-            print(f"  Page {page_num}...", end=" ")
-            
-            data = self.get_nearby_businesses(lat, lng, keyword=keyword if keyword else None, page_token=page_token)
-            
-            if data.get("status") != "OK":
-                print(f"API error: {data.get('status')}")
-                break
-            
-            results = data.get("results", [])
-            if not results:
-                print("no results")
-                break
-            
-            print(f"found {len(results)} businesses")
-            
-            for place in results:
-                place_name = place.get("name")
-                if not place_name or str(place_name).strip() in ["", "None", "null"]:
-                    continue
+        def scanned(business):
+            scan_stats["scanned"] += 1
+            if on_scanned:
+                on_scanned(business)
+        
+        def take_probe(place, probe):
+            """Record a probe result; returns True if the place is still worth a details lookup."""
+            probe["name"] = str(place.get("name")).strip()
+            probed.append((place.get("place_id"), probe["name"], probe.get("website"), probe.get("business_status")))
+            if self.needs_website(probe):
+                return True
+            # The nearby result carries location, types and rating the probe lacks
+            scanned(dict(place, **probe))
+            return False
+        
+        pages = self.iter_nearby_pages(lat, lng, radius=radius, keyword=keyword if keyword else None, max_pages=max_pages, stop_event=stop_event)
+        with closing(pages):
+            for data in pages:
+                if stop_event is not None and stop_event.is_set():
+                    print("  Search stopped")
+                    break
                 
-                place_name = str(place_name).strip()
+                page_num += 1
+                print(f"  Page {page_num}...", end=" ")
                 
-                details = self.get_place_details(place.get("place_id"))
-                details["name"] = place_name
-                all_businesses.append(details)
+                if data.get("status") == "ZERO_RESULTS":
+                    print("no results")
+                    scan_stats["exhausted"] = True
+                    break
                 
-                if not details.get("website"):
-                    found_without_website.append(details)
-                    print(f"    ✓ {place_name} - no website ({len(found_without_website)}/{target_count})")
-            
-            page_token = data.get("next_page_token")
-            if not page_token:
-                print("  Reached end of results")
-                break
-            
-            time.sleep(2)
-        
-        if len(found_without_website) < target_count:
-            print(f"  Only found {len(found_without_website)} businesses without websites after {page_num} pages")
+                if data.get("status") != "OK":
+                    print(f"API error: {data.get('status')}")
+                    scan_stats["error"] = data.get("status") or "UNKNOWN_ERROR"
+                    if data.get("status") == "OVER_QUERY_LIMIT":
+                        print("  Still over quota after retries - lower PLACES_RATE_LIMITS")
+                    break
+                
+                results = data.get("results", [])
+                if not results:
+                    print("no results")
+                    scan_stats["exhausted"] = True
+                    break
+                
+                print(f"found {len(results)} businesses")
+                scan_stats["results"] += len(results)
+                
+                places = [
+                    place for place in results
+                    if place.get("name") and str(place.get("name")).strip() not in ["", "None", "null"]
+                ]
+                # Places the index already knows about skip the probe: ones with a website, closed
+                # for good or already curated are dropped, other known places go straight to details
+                known = self.place_index.lookup([place.get("place_id") for place in places]) if self.place_index else {}
+                ready = []
+                unknown = []
+                for place in places:
+                    entry = known.get(place.get("place_id"))
+                    if entry is None:
+                        unknown.append(place)
+                    elif self.needs_website({"website": entry[0], "business_status": entry[2]}) and entry[1] != STATUS_CURATED:
+                        ready.append(place)
+                if len(places) - len(unknown) - len(ready):
+                    print(f"    Skipped {len(places) - len(unknown) - len(ready)} already-known place(s)")
+                
+                probed = []
+                try:
+                    # Places turned down by accept don't count, so keep going until the page runs out
+                    while found_count < target_count and (ready or unknown):
+                        if stop_event is not None and stop_event.is_set():
+                            break
+                        needed = target_count - found_count
+                        candidates, ready = ready[:needed], ready[needed:]
+                        
+                        # Cheap probe first; only places without a website get the full field mask
+                        if len(candidates) < needed and unknown:
+                            probe_count = 0
+                            # Probes still running once we have enough, by place_id, kept for the next round
+                            early = {}
+                            probe_ids = [place.get("place_id") for place in unknown]
+                            with closing(self.iter_place_details(probe_ids, fields=PROBE_FIELDS, on_unused=early.__setitem__)) as probe_iter:
+                                for place, probe in zip(unknown, probe_iter):
+                                    probe_count += 1
+                                    if take_probe(place, probe):
+                                        candidates.append(place)
+                                        if len(candidates) >= needed:
+                                            break
+                                    if stop_event is not None and stop_event.is_set():
+                                        break
+                            
+                            left = []
+                            for place in unknown[probe_count:]:
+                                probe = early.get(place.get("place_id"))
+                                if probe is None:
+                                    left.append(place)
+                                elif take_probe(place, probe):
+                                    ready.append(place)
+                            unknown = left
+                        
+                        candidate_ids = [place.get("place_id") for place in candidates]
+                        # Details that finish after the consumer stops still go into the index
+                        record_details = lambda place_id, details: probed.append(
+                            (place_id, details.get("name"), details.get("website"), details.get("business_status"))
+                        )
+                        with closing(self.iter_place_details(candidate_ids, on_unused=record_details)) as details_iter:
+                            for place, details in zip(candidates, details_iter):
+                                place_name = str(place.get("name")).strip()
+                                details["name"] = place_name
+                                scanned(details)
+                                probed.append((place.get("place_id"), place_name, details.get("website"), details.get("business_status")))
+                                
+                                if self.needs_website(details):
+                                    business = Business.from_places(details)
+                                    if accept is not None and not accept(business):
+                                        continue
+                                    found_count += 1
+                                    print(f"    ✓ {place_name} - no website ({found_count}/{target_count})")
+                                    yield business
+                finally:
+                    # Also runs when the consumer closes the generator mid-page
+                    if self.place_index:
+                        self.place_index.record_scanned(probed)
+                
+                if ready or unknown:
+                    # Stopped partway through the page (goal met or run stopped)
+                    break
+                
+                if not data.get("next_page_token"):
+                    print("  Reached end of results")
+                    scan_stats["exhausted"] = True
+                    break
+                
+                if found_count >= target_count:
+                    break
         
+        if found_count < target_count:
+            print(f"  Only found {found_count} businesses without websites after {page_num} pages")
+    
+    def find_businesses_without_website(self, lat, lng, keyword="", target_count=5, stop_event=None, radius=5000,
+                                        scan_stats=None):
+        """Collect iter_businesses_without_website into (found_without_website, all_businesses)."""
+        all_businesses = []
+        found_without_website = list(self.iter_businesses_without_website(
+            lat, lng, keyword, target_count, stop_event=stop_event, radius=radius,
+            scan_stats=scan_stats, on_scanned=all_businesses.append
+        ))
         return found_without_website, all_businesses
 
     def find_all_businesses(self, lat, lng, keyword="", target_count=20):
         print(f"\nSearching for {target_count} businesses...")
         
         found = []
-        page_token = None
         page_num = 0
         
-        while len(found) < target_count:
-            page_num += 1
-            print(f"  Page {page_num}...", end=" ")
-            
-            data = self.get_nearby_businesses(lat, lng, keyword=keyword if keyword else None, page_token=page_token)
-            
-            if data.get("status") != "OK":
-                print(f"API error: {data.get('status')}")
-                break
-            
-            results = data.get("results", [])
-            if not results:
-                print("no results")
-                break
-            
-            print(f"found {len(results)} businesses")
-            
-            for place in results:
+        with closing(self.iter_nearby_pages(lat, lng, keyword=keyword if keyword else None)) as pages:
+            for data in pages:
+                page_num += 1
+                print(f"  Page {page_num}...", end=" ")
+                
+                if data.get("status") != "OK":
+                    print(f"API error: {data.get('status')}")
+                    break
+                
+                results = data.get("results", [])
+                if not results:
+                    print("no results")
+                    break
+                
+                print(f"found {len(results)} businesses")
+                
+                place_ids = [place.get("place_id") for place in results[:target_count - len(found)]]
+                
+                with closing(self.iter_place_details(place_ids)) as details_iter:
+                    for details in details_iter:
+                        found.append(details)
+                        website_status = "has website" if details.get("website") else "no website"
+                        print(f"    ✓ {details.get('name')} - {website_status} ({len(found)}/{target_count})")
+                
                 if len(found) >= target_count:
                     break
                 
-                details = self.get_place_details(place.get("place_id"))
-                found.append(details)
-                website_status = "has website" if details.get("website") else "no website"
-                print(f"    ✓ {details.get('name')} - {website_status} ({len(found)}/{target_count})")
-            
-            page_token = data.get("next_page_token")
-            if not page_token:
-                print("  Reached end of results")
-                break
-            
-            time.sleep(2)
+                if not data.get("next_page_token"):
+                    print("  Reached end of results")
+                    break
         
         return found
 
@@ -234,11 +509,8 @@ class GoogleMapsClient:
             query = random.choice(queries)
             
             try:
-                url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
                 params = {"query": query, "key": self.api_key}
-                
-                response = requests.get(url, params=params)
-                data = response.json()
+                data = self._get_json("textsearch", params)
                 
                 if data.get("status") == "OK" and data.get("results"):
                     valid_places = [p for p in data.get("results", [])[:20] 
@@ -0,0 +1,103 @@
+import json
+import queue
+import threading
+from http_session import get_session, backoff_delay
+
+# Event types forwarded to sessions; message.part.* deltas are far too chatty to queue
+FORWARDED_EVENTS = {"session.idle", "session.error", "message.updated"}
+FORWARDED_PREFIXES = ("question.",)
+
+# Reconnect if the stream is silent for this long (seconds)
+STREAM_READ_TIMEOUT = 300
+
+
+def event_session_id(event):
+    props = event.get("properties") or {}
+    return (
+        props.get("sessionID")
+        or (props.get("info") or {}).get("sessionID")
+        or (props.get("part") or {}).get("sessionID")
+    )
+
+
+class OpenCodeEventStream:
+    """One SSE connection to an OpenCode server's /event endpoint, fanned out per session.
+
+    `connected` is set while the stream is live; callers fall back to polling otherwise.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.connected = threading.Event()
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def subscribe(self, session_id):
+        events = queue.Queue()
+        with self._lock:
+            self._listeners[session_id] = events
+        return events
+
+    def unsubscribe(self, session_id):
+        with self._lock:
+            self._listeners.pop(session_id, None)
+
+    def _dispatch(self, event):
+        event_type = event.get("type", "")
+        if event_type not in FORWARDED_EVENTS and not event_type.startswith(FORWARDED_PREFIXES):
+            return
+        with self._lock:
+            events = self._listeners.get(event_session_id(event))
+        if events is not None:
+            events.put(event)
+
+    def _run(self):
+        attempt = 0
+        while True:
+            try:
+                response = get_session().get(
+                    f"{self.base_url}/event",
+                    stream=True,
+                    timeout=(5, STREAM_READ_TIMEOUT),
+                    headers={"Accept": "text/event-stream"}
+                )
+                with response:
+                    if response.status_code != 200:
+                        raise IOError(f"HTTP {response.status_code}")
+                    self.connected.set()
+                    attempt = 0
+
+                    data_lines = []
+                    for line in response.iter_lines(decode_unicode=True):
+                        if line:
+                            if line.startswith("data:"):
+                                data_lines.append(line[5:].lstrip())
+                            continue
+                        if not data_lines:
+                            continue
+                        try:
+                            self._dispatch(json.loads("\n".join(data_lines)))
+                        except ValueError:
+                            pass
+                        data_lines = []
+            except Exception:
+                pass
+
+            self.connected.clear()
+            threading.Event().wait(backoff_delay(min(attempt, 5)))
+            attempt += 1
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def get_event_stream(base_url):
+    with _streams_lock:
+        stream = _streams.get(base_url)
+        if stream is None:
+            stream = OpenCodeEventStream(base_url)
+            _streams[base_url] = stream
+    return stream
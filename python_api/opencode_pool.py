@@ -0,0 +1,146 @@
+import atexit
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from http_session import get_session
+
+HEALTH_CHECK_INTERVAL = 10
+STARTUP_TIMEOUT = 10
+
+
+def is_server_healthy(base_url):
+    try:
+        response = get_session().get(f"{base_url}/global/health", timeout=2)
+        return response.status_code == 200 and response.json().get("healthy")
+    except Exception:
+        return False
+
+
+class OpenCodeServerPool:
+    """A fixed set of `opencode serve` processes on consecutive ports.
+
+    Servers are started once, health-checked in the background and restarted if they
+    die. Sessions lease the least-loaded healthy server.
+    """
+
+    def __init__(self, size, host, base_port, api_key=None):
+        self.host = host
+        self.ports = [int(base_port) + i for i in range(max(1, size))]
+        self.api_key = api_key
+        self.base_urls = [f"http://{host}:{port}" for port in self.ports]
+        self._processes = {}
+        self._healthy = set()
+        self._load = {url: 0 for url in self.base_urls}
+        self._lock = threading.Lock()
+        self._started = False
+        self._cli_missing = False
+        self._stop = threading.Event()
+
+    def _spawn(self, port):
+        env = os.environ.copy()
+        if self.api_key:
+            env["OPENCODE_API_KEY"] = self.api_key
+        return subprocess.Popen(
+            ["opencode", "serve", "--hostname", self.host, "--port", str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+    def _wait_healthy(self, base_url):
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if is_server_healthy(base_url):
+                return True
+            time.sleep(0.5)
+        return False
+
+    def _bring_up(self, port, base_url):
+        if is_server_healthy(base_url):
+            return True
+        process = self._processes.get(port)
+        if process and process.poll() is None:
+            process.terminate()
+        self._processes[port] = self._spawn(port)
+        return self._wait_healthy(base_url)
+
+    def start(self):
+        """Start every server that is not already running; returns True if any is healthy."""
+        with self._lock:
+            if self._started:
+                return bool(self._healthy)
+
+            print(f"Starting {len(self.ports)} OpenCode server(s)...")
+            try:
+                # Spawn everything first so the servers boot in parallel
+                for port, base_url in zip(self.ports, self.base_urls):
+                    if is_server_healthy(base_url):
+                        print(f"  OpenCode server already running at {base_url}")
+                        self._healthy.add(base_url)
+                    else:
+                        self._processes[port] = self._spawn(port)
+            except FileNotFoundError:
+                print("Error: opencode CLI not found. Install from https://opencode.ai/")
+                self._cli_missing = True
+
+            for port, base_url in zip(self.ports, self.base_urls):
+                if port not in self._processes:
+                    continue
+                if self._wait_healthy(base_url):
+                    self._healthy.add(base_url)
+                    print(f"  OpenCode server started at {base_url}")
+                else:
+                    print(f"  Failed to start OpenCode server at {base_url}")
+
+            self._started = True
+            atexit.register(self.shutdown)
+            threading.Thread(target=self._monitor, daemon=True).start()
+            return bool(self._healthy)
+
+    def _monitor(self):
+        while not self._stop.wait(HEALTH_CHECK_INTERVAL):
+            for port, base_url in zip(self.ports, self.base_urls):
+                if is_server_healthy(base_url):
+                    with self._lock:
+                        self._healthy.add(base_url)
+                    continue
+
+                with self._lock:
+                    self._healthy.discard(base_url)
+                if self._cli_missing:
+                    continue
+                print(f"OpenCode server at {base_url} is down, restarting...")
+                try:
+                    if self._bring_up(port, base_url):
+                        with self._lock:
+                            self._healthy.add(base_url)
+                except Exception as e:
+                    print(f"  Restart failed: {e}")
+
+    @contextmanager
+    def lease(self):
+        """Yield the base URL of the least-loaded healthy server, or None if none is up."""
+        with self._lock:
+            candidates = [url for url in self.base_urls if url in self._healthy]
+            base_url = min(candidates, key=lambda url: self._load[url]) if candidates else None
+            if base_url:
+                self._load[base_url] += 1
+        try:
+            yield base_url
+        finally:
+            if base_url:
+                with self._lock:
+                    self._load[base_url] -= 1
+
+    def shutdown(self):
+        self._stop.set()
+        for process in self._processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self._processes.values():
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
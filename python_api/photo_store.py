@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qsl, urlencode
+from dotenv import load_dotenv
+from http_session import get_session
+from places_cache import CACHE_DIR
+from rate_limiter import get_rate_limiter
+
+load_dotenv()
+
+PHOTO_STORE_DIR = os.path.join(CACHE_DIR, "photos")
+PHOTO_DOWNLOAD_CONCURRENCY = int(os.environ.get("PHOTO_DOWNLOAD_CONCURRENCY", "4"))
+
+CHUNK_SIZE = 64 * 1024
+
+
+def photo_source_key(url):
+    """Identify a photo by its URL minus the API key, so key rotation does not re-download."""
+    parsed = urlparse(url)
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query) if k != "key")
+    return f"{parsed.netloc}{parsed.path}?{urlencode(query)}"
+
+
+def extension_for(content_type):
+    if "png" in content_type:
+        return ".png"
+    if "webp" in content_type:
+        return ".webp"
+    return ".jpg"
+
+
+class PhotoStore:
+    """Content-addressed photo blobs shared by every business folder.
+
+    A SQLite table maps each source URL to the hash of its bytes, so a photo seen in an
+    earlier run (or by another process) is linked from the store instead of fetched again.
+    """
+
+    def __init__(self, root=PHOTO_STORE_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "photos.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS photos (
+                source TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                ext TEXT NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._import_legacy_manifest()
+
+    def _import_legacy_manifest(self):
+        """Carry over the manifest.json written by earlier versions, once."""
+        legacy_path = os.path.join(self.root, "manifest.json")
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO photos (source, sha256, ext) VALUES (?, ?, ?)",
+                [(source, entry["sha256"], entry["ext"]) for source, entry in manifest.items()]
+            )
+            self._conn.commit()
+        os.replace(legacy_path, legacy_path + ".imported")
+
+    def blob_path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def lookup(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sha256, ext FROM photos WHERE source = ?", (photo_source_key(url),)
+            ).fetchone()
+        if row:
+            path = self.blob_path(*row)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def fetch(self, url):
+        """Return the store path for url, streaming it to disk if it is not stored yet."""
+        path = self.lookup(url)
+        if path:
+            return path, True
+
+        get_rate_limiter().acquire("photo")
+        response = get_session().get(url, timeout=10, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise IOError(f"HTTP {response.status_code}")
+            ext = extension_for(response.headers.get("content-type", ""))
+
+            digest = hashlib.sha256()
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+                path = self.blob_path(digest.hexdigest(), ext)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+        self._remember(url, digest.hexdigest(), ext)
+        return path, False
+
+    def _remember(self, url, digest, ext):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO photos (source, sha256, ext) VALUES (?, ?, ?)",
+                (photo_source_key(url), digest, ext)
+            )
+            self._conn.commit()
+
+
+def link_into(blob_path, dest_path):
+    """Hardlink a stored blob into a business folder, copying where links are unsupported."""
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+    try:
+        os.link(blob_path, dest_path)
+    except OSError:
+        shutil.copy2(blob_path, dest_path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_photo_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PhotoStore()
+    return _store
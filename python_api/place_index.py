@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from places_cache import CACHE_DIR
+
+STATUS_SCANNED = "scanned"
+STATUS_QUEUED = "queued"
+STATUS_CURATED = "curated"
+
+
+class PlaceIndex:
+    """Persistent record of every place_id ever scanned, keyed for O(1) dedup.
+
+    Each row keeps the website flag and business status from the last scan and, once a
+    place has been picked for generation, the slug its folder lives under.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "place_index.sqlite3")
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode so claim() can take an explicit write lock across processes
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS places (
+                place_id TEXT PRIMARY KEY,
+                name TEXT,
+                has_website INTEGER,
+                slug TEXT,
+                status TEXT NOT NULL,
+                scanned_at REAL NOT NULL
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(places)")}
+        if "business_status" not in columns:
+            self._conn.execute("ALTER TABLE places ADD COLUMN business_status TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS places_slug ON places (slug)")
+
+    def lookup(self, place_ids):
+        """Return {place_id: (has_website, status, business_status)} for the place_ids already in the index."""
+        ids = [p for p in place_ids if p]
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT place_id, has_website, status, business_status FROM places WHERE place_id IN ({placeholders})", ids
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def record_scanned(self, places):
+        """Store (place_id, name, has_website, business_status) tuples without touching claimed slugs."""
+        now = time.time()
+        rows = [
+            (place_id, name, int(bool(has_website)), business_status, STATUS_SCANNED, now)
+            for place_id, name, has_website, business_status in places if place_id
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO places (place_id, name, has_website, business_status, status, scanned_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(place_id) DO UPDATE SET name = excluded.name, has_website = excluded.has_website, "
+                "business_status = excluded.business_status, scanned_at = excluded.scanned_at",
+                rows
+            )
+
+    def claim(self, place_id, name, slug, reserved_slugs=()):
+        """Atomically reserve a folder slug for place_id.
+
+        Returns the slug to use, or None if the place is already curated. A place that
+        was queued before but never finished keeps its earlier slug. A slug held by a
+        different place, or listed in reserved_slugs, gets a numeric suffix.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT slug, status FROM places WHERE place_id = ?", (place_id,)
+                ).fetchone()
+                if row and row[1] == STATUS_CURATED:
+                    self._conn.execute("COMMIT")
+                    return None
+
+                if row and row[0]:
+                    candidate = row[0]
+                else:
+                    candidate = slug
+                    suffix = 2
+                    while candidate in reserved_slugs or self._conn.execute(
+                        "SELECT 1 FROM places WHERE slug = ? AND place_id != ?", (candidate, place_id)
+                    ).fetchone():
+                        tail = f"-{suffix}"
+                        candidate = slug[:50 - len(tail)] + tail
+                        suffix += 1
+
+                self._conn.execute(
+                    "INSERT INTO places (place_id, name, has_website, slug, status, scanned_at) VALUES (?, ?, 0, ?, ?, ?) "
+                    "ON CONFLICT(place_id) DO UPDATE SET slug = excluded.slug, status = excluded.status",
+                    (place_id, name, candidate, STATUS_QUEUED, time.time())
+                )
+                self._conn.execute("COMMIT")
+                return candidate
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def mark_curated(self, place_id, slug):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE places SET slug = ?, status = ? WHERE place_id = ?",
+                (slug, STATUS_CURATED, place_id)
+            )
+
+    def sync_curated(self, businesses_dir, slugs):
+        """Import curated folders that predate the index, using the place_id in their data.json.
+
+        Returns the slugs whose data.json has no place_id; callers should treat those
+        names as taken.
+        """
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT slug FROM places WHERE status = ?", (STATUS_CURATED,))}
+
+        unindexed = set()
+        for slug in slugs:
+            if slug in known:
+                continue
+            try:
+                with open(os.path.join(businesses_dir, slug, "data.json"), "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+            place_id = data.get("place_id")
+            if not place_id:
+                unindexed.add(slug)
+                continue
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO places (place_id, name, has_website, slug, status, scanned_at) VALUES (?, ?, 0, ?, ?, ?) "
+                    "ON CONFLICT(place_id) DO UPDATE SET slug = excluded.slug, status = excluded.status",
+                    (place_id, data.get("name"), slug, STATUS_CURATED, time.time())
+                )
+        return unindexed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
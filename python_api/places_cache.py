@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DIR = os.environ.get(
+    "LOCWEB_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), ".cache")
+)
+
+CACHE_MAX_MB = int(os.environ.get("PLACES_CACHE_MAX_MB", "256"))
+
+# Seconds each endpoint's responses stay fresh
+DEFAULT_TTLS = {
+    "nearbysearch": 24 * 3600,
+    "details": 7 * 24 * 3600,
+    "textsearch": 30 * 24 * 3600,
+}
+
+# Statuses worth remembering; errors and quota failures are always re-fetched
+CACHEABLE_STATUSES = {"OK", "ZERO_RESULTS"}
+
+
+def make_cache_key(endpoint, params):
+    normalized = {k: str(v) for k, v in params.items() if k != "key" and v is not None}
+    return endpoint + "?" + json.dumps(normalized, sort_keys=True)
+
+
+class PlacesCache:
+    """SQLite-backed response cache with per-endpoint TTLs and LRU size bound."""
+
+    def __init__(self, path=None, max_bytes=CACHE_MAX_MB * 1024 * 1024, ttls=None):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "places.sqlite3")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        # Running total of stored bytes; summed once here instead of on every put
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, endpoint, params):
+        key = make_cache_key(endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at, size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row and now - row[1] <= self.ttls.get(endpoint, 0):
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+                self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+                return json.loads(row[0])
+            if row:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= row[2]
+            self.misses[endpoint] = self.misses.get(endpoint, 0) + 1
+        return None
+
+    def put(self, endpoint, params, data):
+        if data.get("status") not in CACHEABLE_STATUSES:
+            return
+        key = make_cache_key(endpoint, params)
+        value = json.dumps(data, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, value, len(value), now, now)
+            )
+            self._total_bytes += len(value) - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        # Free down to 90% of the bound so the table is not walked again on the next put
+        target = self.max_bytes * 0.9
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if self._total_bytes <= target:
+                break
+            stale.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stats(self):
+        endpoints = sorted(set(self.hits) | set(self.misses))
+        return {ep: (self.hits.get(ep, 0), self.misses.get(ep, 0)) for ep in endpoints}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from places_cache import CACHE_DIR
+
+load_dotenv()
+
+# Requests per second allowed for each Google endpoint
+DEFAULT_RATES = {
+    "nearbysearch": 10.0,
+    "details": 50.0,
+    "textsearch": 5.0,
+    "photo": 20.0,
+}
+
+# Approximate USD per 1000 requests (legacy Places SKUs); a details probe only asks
+# for basic and contact fields, a full details call also pulls atmosphere data
+COST_PER_1000 = {
+    "nearbysearch": 32.0,
+    "details": 25.0,
+    "details_probe": 20.0,
+    "textsearch": 32.0,
+    "photo": 7.0,
+}
+
+MONTHLY_CREDIT_USD = float(os.environ.get("PLACES_MONTHLY_CREDIT_USD", "200"))
+
+# Share one set of buckets between every process on the host through SQLite
+RATE_LIMIT_SHARED = os.environ.get("PLACES_RATE_LIMIT_SHARED", "0") == "1"
+
+
+def parse_rates(value):
+    """Parse "nearbysearch=10,details=40" into {endpoint: rate} on top of DEFAULT_RATES."""
+    rates = dict(DEFAULT_RATES)
+    for item in (value or "").split(","):
+        if "=" in item:
+            endpoint, rate = item.split("=", 1)
+            rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `burst`; acquire() blocks until one is free."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self, seconds):
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class SharedTokenBucket:
+    """TokenBucket whose state lives in a SQLite row, so separate processes share it."""
+
+    def __init__(self, conn, conn_lock, endpoint, rate, burst=None):
+        self.endpoint = endpoint
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._conn = conn
+        self._lock = conn_lock
+
+    def _update(self, drain_seconds=None):
+        """Refill, then take a token (or drain) in one write transaction.
+
+        Returns 0 when a token was taken, otherwise the seconds until one is due.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, updated FROM buckets WHERE endpoint = ?", (self.endpoint,)
+                ).fetchone()
+                tokens = self.burst if row is None else min(self.burst, row[0] + (now - row[1]) * self.rate)
+                wait = 0
+                if drain_seconds is not None:
+                    tokens = min(tokens, 0) - drain_seconds * self.rate
+                elif tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (endpoint, tokens, updated) VALUES (?, ?, ?)",
+                    (self.endpoint, tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self):
+        while True:
+            wait = self._update()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def drain(self, seconds):
+        self._update(drain_seconds=seconds)
+
+
+class RateLimiter:
+    """Per-endpoint request rates plus a count of every request sent, by SKU."""
+
+    def __init__(self, rates=None, shared=RATE_LIMIT_SHARED, path=None):
+        self.rates = rates or parse_rates(os.environ.get("PLACES_RATE_LIMITS"))
+        self.counts = {}
+        self._counts_lock = threading.Lock()
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._conn = None
+        self._conn_lock = threading.Lock()
+
+        if shared:
+            if path is None:
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                path = os.path.join(CACHE_DIR, "ratelimit.sqlite3")
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (endpoint TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _bucket(self, endpoint):
+        with self._buckets_lock:
+            bucket = self._buckets.get(endpoint)
+            if bucket is None:
+                rate = self.rates.get(endpoint)
+                if rate is None:
+                    return None
+                if self._conn is not None:
+                    bucket = SharedTokenBucket(self._conn, self._conn_lock, endpoint, rate)
+                else:
+                    bucket = TokenBucket(rate)
+                self._buckets[endpoint] = bucket
+        return bucket
+
+    def acquire(self, endpoint, sku=None):
+        """Block until endpoint has capacity, then count the request against sku."""
+        bucket = self._bucket(endpoint)
+        if bucket is not None:
+            bucket.acquire()
+        sku = sku or endpoint
+        with self._counts_lock:
+            self.counts[sku] = self.counts.get(sku, 0) + 1
+
+    def drain(self, endpoint, seconds):
+        """Hold back every caller of endpoint for about `seconds`, e.g. after OVER_QUERY_LIMIT."""
+        bucket = self._bucket(endpoint)
+        if bucket is not None:
+            bucket.drain(seconds)
+
+    def total_requests(self):
+        """Every billed request counted so far, photos included."""
+        with self._counts_lock:
+            return sum(self.counts.values())
+
+    def estimated_cost(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        return sum(COST_PER_1000.get(sku, 0) * n / 1000 for sku, n in counts.items())
+
+    def summary_lines(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        lines = [f"Requests {sku}: {n}" for sku, n in sorted(counts.items())]
+        cost = self.estimated_cost()
+        line = f"Estimated cost: ${cost:.2f}"
+        if MONTHLY_CREDIT_USD:
+            line += f" ({cost / MONTHLY_CREDIT_USD:.1%} of ${MONTHLY_CREDIT_USD:.0f} monthly credit)"
+        lines.append(line)
+        return lines
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
@@ -0,0 +1,229 @@
+import atexit
+import glob
+import gzip
+import io
+import json
+import os
+import threading
+import time
+import zlib
+from dotenv import load_dotenv
+from places_cache import CACHE_DIR
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+# "zstd" (needs the zstandard package) or "gzip"
+SCAN_ARCHIVE_CODEC = os.environ.get("SCAN_ARCHIVE_CODEC", "zstd" if zstandard else "gzip")
+# Records buffered before they are compressed and appended as one frame
+SCAN_ARCHIVE_FLUSH_RECORDS = int(os.environ.get("SCAN_ARCHIVE_FLUSH_RECORDS", "500"))
+
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+ARCHIVE_BASE = os.path.join(CACHE_DIR, "scans.jsonl")
+
+# Fields kept from each scanned place; reviews and photo metadata are dropped
+SCAN_FIELDS = ("place_id", "name", "business_status", "rating", "user_ratings_total", "types", "vicinity")
+
+# What a damaged frame raises partway through an archive
+READ_ERRORS = (EOFError, OSError, RuntimeError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def compact_record(business):
+    record = {field: business[field] for field in SCAN_FIELDS if business.get(field) is not None}
+    location = (business.get("geometry") or {}).get("location") or {}
+    if location.get("lat") is not None:
+        record["lat"] = round(location["lat"], 6)
+        record["lng"] = round(location["lng"], 6)
+    record["has_website"] = bool(business.get("website"))
+    return record
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data)
+
+
+def complete_length(path, codec, chunk_size=1 << 20):
+    """Byte length of the run of complete frames at the start of an archive."""
+    def new_frame():
+        if codec == "zstd":
+            return zstandard.ZstdDecompressor().decompressobj()
+        return zlib.decompressobj(wbits=31)
+
+    complete = 0
+    frame_bytes = 0
+    decompressor = None
+    data = b""
+    with open(path, "rb") as f:
+        while True:
+            if not data:
+                data = f.read(chunk_size)
+                if not data:
+                    return complete
+            if decompressor is None:
+                decompressor = new_frame()
+            try:
+                decompressor.decompress(data)
+            except READ_ERRORS:
+                return complete
+            if decompressor.eof:
+                rest = decompressor.unused_data
+                complete += frame_bytes + len(data) - len(rest)
+                frame_bytes = 0
+                decompressor = None
+                data = rest
+            else:
+                frame_bytes += len(data)
+                data = b""
+
+
+class ScanLog:
+    """Append-only compressed JSONL archive of every place looked at during Phase 1.
+
+    Records are buffered and appended as independent gzip members or zstd frames, so
+    the file is never rewritten and a crash loses at most the unflushed buffer. A frame
+    cut short by a crash would make every frame appended after it unreadable, so before
+    its first append the log moves an archive that does not end on a complete frame aside.
+    """
+
+    def __init__(self, path=None, codec=SCAN_ARCHIVE_CODEC, flush_records=SCAN_ARCHIVE_FLUSH_RECORDS):
+        if codec == "zstd" and zstandard is None:
+            print("zstandard not installed - writing the scan archive with gzip")
+            codec = "gzip"
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = ARCHIVE_BASE + EXTENSIONS[codec]
+        self.path = path
+        self.codec = codec
+        self.flush_records = max(1, flush_records)
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._checked = False
+        atexit.register(self.close)
+
+    def write(self, business, area=None):
+        record = compact_record(business)
+        record["ts"] = round(time.time())
+        if area:
+            record["area"] = area
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.flush_records:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        if not self._checked:
+            self._rotate_if_damaged()
+            self._checked = True
+        frame = _compress("".join(self._buffer).encode("utf-8"), self.codec)
+        with open(self.path, "ab") as f:
+            f.write(frame)
+        self._buffer = []
+
+    def _rotate_if_damaged(self):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if complete_length(self.path, self.codec) == size:
+            return
+        root, ext = os.path.splitext(self.path)
+        damaged_path = f"{root}.damaged-{time.time_ns()}{ext}"
+        os.replace(self.path, damaged_path)
+        print(f"Scan archive ends in an incomplete frame - moved it to {damaged_path}")
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+
+def _open_text(path):
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is needed to read {path}")
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def archive_paths():
+    """Existing scan archives under the cache dir, including the legacy log and damaged ones moved aside."""
+    candidates = [ARCHIVE_BASE]
+    for ext in EXTENSIONS.values():
+        candidates += sorted(glob.glob(glob.escape(ARCHIVE_BASE) + ".damaged-*" + ext))
+        candidates.append(ARCHIVE_BASE + ext)
+    return [path for path in candidates if os.path.exists(path)]
+
+
+def iter_scans(paths=None):
+    """Yield every record in the given archives (default: all of them) in write order."""
+    for path in paths or archive_paths():
+        try:
+            with _open_text(path) as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except READ_ERRORS as e:
+            # A damaged frame ends the readable part of the file
+            print(f"Stopped reading {path}: {e}")
+
+
+def load_scans(paths=None):
+    """Return {place_id: latest record} across the archives."""
+    latest = {}
+    for record in iter_scans(paths):
+        place_id = record.get("place_id")
+        if place_id and record.get("ts", 0) >= latest.get(place_id, {}).get("ts", 0):
+            latest[place_id] = record
+    return latest
+
+
+def query_scans(records, has_website=None, area=None, types=None, min_rating=None, min_reviews=None,
+                since=None, bbox=None):
+    """Filter scan records; bbox is (min_lat, min_lng, max_lat, max_lng)."""
+    wanted_types = set(types or ())
+    for record in records:
+        if has_website is not None and record.get("has_website") != has_website:
+            continue
+        if area is not None and record.get("area") != area:
+            continue
+        if wanted_types and not wanted_types & set(record.get("types") or ()):
+            continue
+        if min_rating is not None and (record.get("rating") or 0) < min_rating:
+            continue
+        if min_reviews is not None and (record.get("user_ratings_total") or 0) < min_reviews:
+            continue
+        if since is not None and record.get("ts", 0) < since:
+            continue
+        if bbox is not None:
+            lat, lng = record.get("lat"), record.get("lng")
+            if lat is None or not (bbox[0] <= lat <= bbox[2] and bbox[1] <= lng <= bbox[3]):
+                continue
+        yield record
+
+
+def candidate_leads(records=None, **filters):
+    """Open places without a website, most-reviewed first."""
+    if records is None:
+        records = load_scans().values()
+    leads = [
+        record for record in query_scans(records, has_website=False, **filters)
+        if record.get("business_status") != "CLOSED_PERMANENTLY"
+    ]
+    leads.sort(key=lambda r: (r.get("user_ratings_total") or 0, r.get("rating") or 0), reverse=True)
+    return leads
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+
+PUBLIC_BUSINESSES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "public", "businesses")
+INDEX_NAME = "index.json"
+# Present while a folder only holds the stub page; removed once the site is built
+BUILD_MARKER = ".building"
+
+
+def read_site(folder_path, slug):
+    """Build the index entry for one site folder, or None if it has no readable data.json."""
+    try:
+        with open(os.path.join(folder_path, "data.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    index_html = os.path.join(folder_path, "index.html")
+    finished = os.path.exists(index_html) and not os.path.exists(os.path.join(folder_path, BUILD_MARKER))
+    return {
+        "slug": slug,
+        "name": data.get("name") or slug,
+        "place_id": data.get("place_id"),
+        "generated_at": round(os.path.getmtime(index_html)) if finished else None,
+        "photos": len(data.get("local_photos") or []),
+        "has_pitch": os.path.exists(os.path.join(folder_path, "phone_pitch.txt")),
+        "content_hash": (data.get("fingerprints") or {}).get("content"),
+    }
+
+
+class SiteIndex:
+    """public/businesses/index.json: one entry per site folder that has a data.json.
+
+    The pipeline updates the entry whenever it writes a folder, so listing sites costs
+    one file read instead of a walk over every folder. After each write the file's mtime
+    is set to the directory's, so folders added or removed behind our back (git pull,
+    rm -r) leave the directory newer than the index and trigger a full rebuild.
+    """
+
+    def __init__(self, businesses_dir=PUBLIC_BUSINESSES_DIR):
+        self.businesses_dir = businesses_dir
+        self.path = os.path.join(businesses_dir, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._sites = None
+        self._written_ns = None
+
+    def _is_current(self):
+        try:
+            index_ns = os.stat(self.path).st_mtime_ns
+            return index_ns >= os.stat(self.businesses_dir).st_mtime_ns
+        except OSError:
+            return False
+
+    def _load_locked(self, trust_memory=False):
+        """Make self._sites current, rebuilding from the folders if the index is stale.
+
+        Writers pass trust_memory because creating the folder they are about to index
+        has itself made the directory newer than the index.
+        """
+        if self._sites is not None:
+            try:
+                unchanged = os.stat(self.path).st_mtime_ns == self._written_ns
+            except OSError:
+                unchanged = False
+            if unchanged and (trust_memory or self._is_current()):
+                return
+        if self._is_current():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._sites = json.load(f).get("sites", {})
+                self._written_ns = os.stat(self.path).st_mtime_ns
+                return
+            except (OSError, ValueError):
+                pass
+        self._rebuild_locked()
+
+    def _rebuild_locked(self):
+        sites = {}
+        if os.path.isdir(self.businesses_dir):
+            for item in os.listdir(self.businesses_dir):
+                folder_path = os.path.join(self.businesses_dir, item)
+                if os.path.isdir(folder_path):
+                    entry = read_site(folder_path, item)
+                    if entry:
+                        sites[item] = entry
+            print(f"Rebuilt {INDEX_NAME} with {len(sites)} site(s)")
+        self._sites = sites
+        self._write_locked()
+
+    def _write_locked(self):
+        if not os.path.isdir(self.businesses_dir):
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sites": dict(sorted(self._sites.items()))}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        dir_ns = os.stat(self.businesses_dir).st_mtime_ns
+        os.utime(self.path, ns=(dir_ns, dir_ns))
+        self._written_ns = dir_ns
+
+    def sites(self):
+        """Return {slug: entry} for every site."""
+        with self._lock:
+            self._load_locked()
+            return dict(self._sites)
+
+    def slugs(self):
+        return set(self.sites())
+
+    def refresh(self, slug):
+        """Re-read one site folder after it was written, dropping it if data.json is gone."""
+        with self._lock:
+            self._load_locked(trust_memory=True)
+            entry = read_site(os.path.join(self.businesses_dir, slug), slug)
+            if entry:
+                self._sites[slug] = entry
+            else:
+                self._sites.pop(slug, None)
+            self._write_locked()
+
+    def remove(self, slug):
+        with self._lock:
+            self._load_locked(trust_memory=True)
+            self._sites.pop(slug, None)
+            self._write_locked()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_site_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SiteIndex()
+    return _index
@@ -4,36 +4,67 @@ import path from "path"
 
 const BUSINESSES_DIR = path.join(process.cwd(), "public", "businesses")
 
-function getAllBusinessSlugs(): string[] {
+interface SiteEntry {
+  slug: string
+  name: string
+  place_id: string | null
+  generated_at: number | null
+  photos: number
+  has_pitch: boolean
+  content_hash: string | null
+}
+
+// public/businesses/index.json is kept up to date by the Python pipeline
+function readSiteIndex(): SiteEntry[] | null {
+  try {
+    const content = fs.readFileSync(path.join(BUSINESSES_DIR, "index.json"), "utf-8")
+    const sites: Record<string, SiteEntry> = JSON.parse(content).sites ?? {}
+    // The pipeline writes entries sorted by slug
+    return Object.values(sites)
+  } catch {
+    return null
+  }
+}
+
+function getBusinessName(slug: string): string {
+  return decodeURIComponent(slug).replace(/-/g, " ").replace(/\+/g, " ")
+}
+
+// Fallback for a checkout where the pipeline has not written index.json yet
+function scanBusinessDirs(): SiteEntry[] {
   if (!fs.existsSync(BUSINESSES_DIR)) {
     return []
   }
   
   try {
-    const slugs = new Set<string>()
+    const sites: SiteEntry[] = []
     const entries = fs.readdirSync(BUSINESSES_DIR, { withFileTypes: true })
     
     for (const entry of entries) {
       if (entry.isDirectory()) {
         const dataFile = path.join(BUSINESSES_DIR, entry.name, "data.json")
         if (fs.existsSync(dataFile)) {
-          slugs.add(entry.name)
+          sites.push({
+            slug: entry.name,
+            name: getBusinessName(entry.name),
+            place_id: null,
+            generated_at: null,
+            photos: 0,
+            has_pitch: false,
+            content_hash: null,
+          })
         }
       }
     }
     
-    return Array.from(slugs).sort()
+    return sites.sort((a, b) => (a.slug < b.slug ? -1 : a.slug > b.slug ? 1 : 0))
   } catch {
     return []
   }
 }
 
-function getBusinessName(slug: string): string {
-  return decodeURIComponent(slug).replace(/-/g, " ").replace(/\+/g, " ")
-}
-
 export default function Master() {
-  const businessSlugs = getAllBusinessSlugs()
+  const sites = readSiteIndex() ?? scanBusinessDirs()
 
   return (
     <div className="min-h-screen bg-gray-50">
@@ -49,7 +80,7 @@ export default function Master() {
       </header>
 
       <main className="max-w-7xl mx-auto py-6 sm:px-6 lg:px-8">
-        {businessSlugs.length === 0 ? (
+        {sites.length === 0 ? (
           <div className="text-center py-12">
             <p className="text-gray-500">
               No business websites yet. Run the Python script to generate one.
@@ -57,15 +88,15 @@ export default function Master() {
           </div>
         ) : (
           <div className="grid grid-cols-1 gap-6 sm:grid-cols-2 lg:grid-cols-3 px-4">
-            {businessSlugs.map((slug) => (
+            {sites.map((site) => (
               <Link
-                key={slug}
-                href={`/web/${encodeURIComponent(slug)}`}
+                key={site.slug}
+                href={`/web/${encodeURIComponent(site.slug)}`}
                 className="block bg-white rounded-lg shadow hover:shadow-md transition-shadow"
               >
                 <div className="p-6">
                   <h2 className="text-xl font-semibold text-gray-900 mb-2">
-                    {getBusinessName(slug)}
+                    {site.name}
                   </h2>
                   <span className="text-sm text-blue-600">
                     View Website →
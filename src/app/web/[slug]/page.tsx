@@ -46,6 +46,13 @@ function readHtmlContent(slug: string): string | null {
           return `${attr}="/businesses/${slug}/${imagePath}"`
         }
       )
+      // Handle srcset="photos/a-400.webp 400w, photos/a-800.webp 800w"; spaces separate
+      // candidates there, so the slug has to be encoded
+      html = html.replace(/srcset=['"]([^'"]*photos\/[^'"]*)['"]/g,
+        (match, srcset) => {
+          return `srcset="${srcset.replace(/(^|,\s*)(photos\/)/g, `$1/businesses/${encodeURIComponent(slug)}/$2`)}"`
+        }
+      )
       // Handle background-image with url()
       html = html.replace(/url\(['"]?(photos\/[^'")\s]+)['"]?\)/g, 
         (match, imagePath) => {